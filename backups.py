@@ -0,0 +1,149 @@
+"""Incremental, compressed database snapshots.
+
+A chain starts with a full snapshot (`snapshot-<time>.full.gz`, the gzipped
+database file) followed by up to `chain_length` deltas (`snapshot-<time>.delta.gz`)
+holding only the pages that changed since the previous snapshot. Any point in
+time can be rebuilt by replaying a chain, see `restore` and scripts/restore_backup.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import gzip
+from pathlib import Path
+import struct
+from typing import AsyncIterator
+
+import aiosqlite
+
+# deltas to take after each full snapshot
+chain_length = 6
+# full chains to keep around
+chains_kept = 2
+# webhook attachment limit, with some room to spare
+upload_limit = 8 * 1024 * 1024
+
+delta_magic = b"oliviabot delta 1\n"
+delta_header = struct.Struct(">II")
+delta_page = struct.Struct(">I")
+
+def snapshot_time(path: Path) -> datetime.datetime:
+    stamp = path.name.removeprefix("snapshot-").split(".")[0]
+    return datetime.datetime.fromisoformat(stamp)
+
+def is_full(path: Path) -> bool:
+    return path.name.endswith(".full.gz")
+
+def snapshots(backup_dir: Path) -> list[Path]:
+    return sorted(backup_dir.glob("snapshot-*.gz"), key=snapshot_time)
+
+def page_size_of(image: bytes) -> int:
+    # see https://www.sqlite.org/fileformat.html#the_database_header
+    [size] = struct.unpack_from(">H", image, 16)
+    return 65536 if size == 1 else size
+
+def encode_delta(old: bytes, new: bytes) -> bytes | None:
+    """Encodes the pages of `new` that differ from `old`, or None if they aren't comparable"""
+    page_size = page_size_of(new)
+    if len(old) < 100 or page_size_of(old) != page_size:
+        return None
+    page_count = len(new) // page_size
+    parts = [delta_magic, delta_header.pack(page_size, page_count)]
+    for i in range(page_count):
+        start = i * page_size
+        page = new[start:start + page_size]
+        if old[start:start + page_size] != page:
+            parts.append(delta_page.pack(i))
+            parts.append(page)
+    return b"".join(parts)
+
+def apply_delta(old: bytes, delta: bytes) -> bytes:
+    if not delta.startswith(delta_magic):
+        raise ValueError("Not a delta snapshot")
+    offset = len(delta_magic)
+    page_size, page_count = delta_header.unpack_from(delta, offset)
+    offset += delta_header.size
+    image = bytearray(old[:page_size * page_count].ljust(page_size * page_count, b"\0"))
+    while offset < len(delta):
+        [i] = delta_page.unpack_from(delta, offset)
+        offset += delta_page.size
+        image[i * page_size:(i + 1) * page_size] = delta[offset:offset + page_size]
+        offset += page_size
+    return bytes(image)
+
+async def take_snapshot(
+    source: aiosqlite.Connection, backup_dir: Path, *, now: datetime.datetime, pages: int = 256
+) -> Path:
+    """Copies the database `pages` pages at a time, so no lock is ever held for long,
+    then stores it as the next link of the current chain."""
+    scratch = backup_dir / ".snapshot.db"
+    scratch.unlink(missing_ok=True)
+    async with aiosqlite.connect(scratch) as target:
+        await source.backup(target, pages=pages, sleep=0.01)
+    image = await asyncio.to_thread(scratch.read_bytes)
+    path = await asyncio.to_thread(write_snapshot, backup_dir, image, now)
+    scratch.unlink()
+    return path
+
+def write_snapshot(backup_dir: Path, image: bytes, now: datetime.datetime) -> Path:
+    # the previous image is kept uncompressed to diff against
+    latest = backup_dir / "latest.db"
+    existing = snapshots(backup_dir)
+    since_full = next(
+        (i for i, path in enumerate(reversed(existing)) if is_full(path)),
+        None
+    )
+    delta = None
+    if latest.exists() and since_full is not None and since_full < chain_length:
+        delta = encode_delta(latest.read_bytes(), image)
+
+    stamp = now.isoformat(timespec="seconds")
+    if delta is None:
+        path = backup_dir / f"snapshot-{stamp}.full.gz"
+        data = image
+    else:
+        path = backup_dir / f"snapshot-{stamp}.delta.gz"
+        data = delta
+    partial = path.with_name(path.name + ".partial")
+    with gzip.open(partial, "wb") as f:
+        f.write(data)
+    partial.replace(path)
+    partial_latest = latest.with_name("latest.db.partial")
+    partial_latest.write_bytes(image)
+    partial_latest.replace(latest)
+
+    prune(backup_dir)
+    return path
+
+def prune(backup_dir: Path) -> None:
+    existing = snapshots(backup_dir)
+    fulls = [path for path in existing if is_full(path)]
+    if len(fulls) <= chains_kept:
+        return
+    oldest_kept = snapshot_time(fulls[-chains_kept])
+    for path in existing:
+        if snapshot_time(path) < oldest_kept:
+            path.unlink()
+
+def restore(backup_dir: Path, until: datetime.datetime | None = None) -> bytes:
+    """Rebuilds the database as of the latest snapshot taken at or before `until`"""
+    chain = [
+        path for path in snapshots(backup_dir)
+        if until is None or snapshot_time(path) <= until
+    ]
+    starts = [i for i, path in enumerate(chain) if is_full(path)]
+    if not starts:
+        raise FileNotFoundError(f"No full snapshot in {backup_dir} from before {until}")
+    image = gzip.decompress(chain[starts[-1]].read_bytes())
+    for path in chain[starts[-1] + 1:]:
+        image = apply_delta(image, gzip.decompress(path.read_bytes()))
+    return image
+
+async def split_for_upload(path: Path, limit: int = upload_limit) -> AsyncIterator[tuple[str, bytes]]:
+    """Splits a snapshot into attachments under the limit, reading one at a time off the event loop.
+    The parts concatenate back into the original file, e.g. `cat name.part* > name`."""
+    count = max(1, -(-path.stat().st_size // limit))
+    with path.open("rb") as file:
+        for i in range(count):
+            chunk = await asyncio.to_thread(file.read, limit)
+            yield (path.name if count == 1 else f"{path.name}.part{i + 1:02}of{count:02}", chunk)
@@ -1,17 +1,56 @@
 from __future__ import annotations
 import asyncio
+from contextvars import ContextVar
 from datetime import datetime, timedelta
+import functools
+import hashlib
+import json
 import logging
 from pathlib import Path
 import re
-from typing import Any, Callable
+import time
+from typing import Any, AsyncContextManager, Callable
+import zlib
 
 import aiosqlite
-import aiosqlite.context
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
+import backups
 import config
+from database import (
+    InstrumentedCursor,
+    QueryStats,
+    ReadPool,
+    WriteBuffer,
+    call_site,
+    current_command,
+    cursor_forwarders,
+    instrumented,
+)
+from dispatch import MessageDispatcher
+from metrics import CommandMetrics, LoopMonitor, PhaseTimer, ms
+from migrations import main_migrations, migrate
+from outbound import Outbound, log_failure, message_limit, split_message
+from proxying import PendingProxy, ProxyMatcher
+from settings import UserSettings
+from shipping import LogShipper, Priority
+from users import UserIndex
+
+# set as each message comes in, so contexts created from it know how long it's been waiting
+message_received: ContextVar[float] = ContextVar("message_received")
+
+def alias_key(user_id: int, alias: str) -> str:
+    """Identifies an alias row in the aliases bot-chitter table"""
+    return f"{user_id} {alias}"
+
+def alias_hash(user_id: int, alias: str) -> int:
+    """Summed over `person_aliases` as its fingerprint, both in Python and in SQL.
+
+    crc32 stays the same between runs, unlike `hash`, and is small enough that
+    the sum can't overflow.
+    """
+    return zlib.crc32(alias_key(user_id, alias).encode())
 
 class OliviaBot(commands.Bot):
     owner_ids: set[int]
@@ -25,6 +64,8 @@ class OliviaBot(commands.Bot):
         *,
         prod: bool,
         db: aiosqlite.Connection,
+        readers: ReadPool,
+        buffer_db: aiosqlite.Connection,
         chitter_db: aiosqlite.Connection,
         testing_guild_id: int,
         testing_channel_id: int,
@@ -69,6 +110,7 @@ class OliviaBot(commands.Bot):
             self.activated_extensions.append("cogs.terminal")
 
         self.db = db
+        self.readers = readers
         self.chitter_db = chitter_db
         self.testing_guild_id = testing_guild_id
         self.testing_channel_id = testing_channel_id
@@ -83,6 +125,21 @@ class OliviaBot(commands.Bot):
         self.terminal_cog_interrupted = False
         self.person_aliases = {}
         self.inv_person_aliases = {}
+        self.user_index = UserIndex()
+        self.aliases_fingerprint: tuple[int, ...] = (0, 0)
+        self.settings = UserSettings(self)
+        self.writes = WriteBuffer(self, buffer_db)
+        self.query_stats = QueryStats(on_slow=self.on_slow_query)
+        self.startup = PhaseTimer()
+        self.proxies = ProxyMatcher(self.process_unproxied)
+        # the event loop only keeps weak references to tasks
+        self.unproxied_tasks: set[asyncio.Task[None]] = set()
+        self.dispatcher = MessageDispatcher(self)
+        self.before_invoke(self.record_conversion)
+        self.command_metrics = CommandMetrics()
+        self.loop_monitor = LoopMonitor(self.on_stall)
+        self.outbound = Outbound()
+        self.shipper = LogShipper(self)
 
     async def start(self, *args, **kwargs):
         return await super().start(config.bot_token, *args, **kwargs)
@@ -90,243 +147,214 @@ class OliviaBot(commands.Bot):
     async def get_context(self, message, *, cls: type[commands.Context] | None = None):
         return await super().get_context(message, cls=cls or Context)
 
-    async def is_proxied(self, user: discord.abc.User) -> bool:
-        async with self.cursor() as cur:
-            await cur.execute(
-                "SELECT EXISTS (SELECT * FROM proxiers WHERE user_id = ?);",
-                [user.id],
-            )
-            result = await cur.fetchone()
-        return bool(result and result[0])
+    async def invoke(self, ctx: commands.Context[OliviaBot]) -> None:
+        command = ctx.command.qualified_name if ctx.command else None
+        token = current_command.set(command)
+        if isinstance(ctx, Context):
+            ctx.invoked_at = time.perf_counter()
+        try:
+            with self.loop_monitor.running(command):
+                await super().invoke(ctx)
+        finally:
+            current_command.reset(token)
+
+    async def record_conversion(self, ctx: commands.Context[OliviaBot]) -> None:
+        # the bot's before_invoke hook runs last before the callback, once its arguments are converted
+        if isinstance(ctx, Context):
+            ctx.converted_at = time.perf_counter()
+
+    def is_proxied(self, user: discord.abc.User) -> bool:
+        return self.settings.is_proxied(user.id)
+
+    async def prefixes(self, message: discord.Message) -> list[str]:
+        prefix = await self.get_prefix(message)
+        return [prefix] if isinstance(prefix, str) else prefix
+
+    async def on_message(self, message: discord.Message) -> None:
+        message_received.set(time.perf_counter())
+        await self.dispatcher.dispatch(message)
+
+    async def add_cog(self, cog: commands.Cog, /, **kwargs: Any) -> None:
+        await super().add_cog(cog, **kwargs)
+        self.dispatcher.rebuild()
+
+    async def remove_cog(self, name: str, /, **kwargs: Any) -> commands.Cog | None:
+        cog = await super().remove_cog(name, **kwargs)
+        self.dispatcher.rebuild()
+        return cog
 
     async def process_commands(self, message: discord.Message) -> None:
-        if await self.is_proxied(message.author):
+        if message.author.bot:
+            if self.proxies.pending:
+                original = self.proxies.match(message, await self.prefixes(message))
+                if original is not None:
+                    ctx = await self.get_context(message)
+                    ctx.author = original.message.author
+                    # the command has been waiting since the original came in, not the echo
+                    ctx.received_at = original.message_received
+                    await self.invoke(ctx)
+            return
+
+        if self.is_proxied(message.author) and self.proxies.expect(
+            message, await self.prefixes(message), message_received.get(time.perf_counter())
+        ):
+            # handled by either the echo or `process_unproxied`
+            return
+        await super().process_commands(message)
+
+    def process_unproxied(self, original: PendingProxy) -> None:
+        message = original.message
+        async def process():
+            # the expiry timer runs in the context of whichever message started it
+            message_received.set(original.message_received)
             try:
-                new_message = await self.wait_for(
-                    "message",
-                    timeout=2.0,
-                    check=lambda new_message: (
-                        new_message.author.bot
-                        and new_message.channel == message.channel
-                        and new_message.content in message.content
-                    ),
-                )
-                ctx = await self.get_context(new_message)
-                ctx.author = message.author
-            except asyncio.TimeoutError:
                 ctx = await self.get_context(message)
-
-            await self.invoke(ctx)
-        else:
-            print(123)
-            await super().process_commands(message)
+                await self.invoke(ctx)
+            except Exception:
+                await self.on_error("process_unproxied", message)
+        task = asyncio.create_task(process())
+        self.unproxied_tasks.add(task)
+        task.add_done_callback(self.unproxied_tasks.discard)
 
     async def on_ready(self) -> None:
         assert self.user
-        await self.webhook.send(f"Logged in as {self.user} (ID: {self.user.id})")
+        message = f"Logged in as {self.user} (ID: {self.user.id})"
+        # on_ready fires again after every reconnect
+        if "ready" not in self.startup.phases:
+            self.startup.mark("ready")
+            report = self.startup.report()
+            logging.info(f"Startup timings:\n{report}")
+            message += f"\n```\n{report}\n```"
+        self.shipper.log(message, Priority.HIGH)
+        # member events may have been missed while disconnected
+        start = time.perf_counter()
+        self.user_index.rebuild(self.users, self.guilds)
+        logging.info(f"Indexed {len(self.user_index)} users in {ms(time.perf_counter() - start)}")
         await self.refresh_aliases()
+
+    async def on_member_join(self, member: discord.Member) -> None:
+        self.user_index.add_member(member)
+
+    async def on_member_remove(self, member: discord.Member) -> None:
+        self.user_index.remove_member(member)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        self.user_index.add_member(after)
+
+    async def on_user_update(self, before: discord.User, after: discord.User) -> None:
+        self.user_index.add_user(after)
+
+    async def on_guild_join(self, guild: discord.Guild) -> None:
+        self.user_index.add_guild(guild)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        self.user_index.remove_guild(guild)
     
-    async def webhook_send(self, message: str) -> None:
-        assert self.user
-        webhook = discord.Webhook.from_url(self.webhook_url, client=self)
-        msg = f"Logged in as {self.user} (ID: {self.user.id})"
-        logging.info(msg)
-        await webhook.send(msg)
+    def webhook_send(self, message: str, priority: Priority = Priority.INFO) -> None:
+        """Logs a message, and ships it to the webhook with the next digest"""
+        logging.info(message)
+        self.shipper.log(message, priority)
 
     async def perform_migrations(self):
-        async with self.cursor() as cur:
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS params(
-                    last_neofetch_update INTEGER NOT NULL
-                );
-                """
-            )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS neofetch(
-                    distro TEXT NOT NULL,
-                    suffix TEXT NOT NULL,
-                    pattern TEXT NOT NULL,
-                    mobile_width INTEGER NOT NULL,
-                    color_index INTEGER NOT NULL,
-                    color_rgb TEXT NOT NULL,
-                    logo TEXT NOT NULL
-                );
-                """
-            )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS vore(
-                    timestamp INTEGER PRIMARY KEY,
-                    channel_id INTEGER NOT NULL,
-                    message_id INTEGER NOT NULL
-                );
-                """
-            )
-            try:
-                await cur.executescript(
-                    """ALTER TABLE params ADD COLUMN louna_command_count INTEGER DEFAULT 0;
-                    ALTER TABLE params ADD COLUMN louna_emoji_count INTEGER DEFAULT 0;
-                    """
-                )
-            except aiosqlite.OperationalError:
-                pass
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS proxiers(
-                    user_id INTEGER PRIMARY KEY
-                );
-                """
-            )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS likers(
-                    user_id INTEGER PRIMARY KEY,
-                    enabled_after REAL NOT NULL
-                );
-                """
-            )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS auto_olivias(
-                    user_id INTEGER PRIMARY KEY
-                );
-                """
-            )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS tempemoji(
-                    emoji_id INTEGER PRIMARY KEY,
-                    guild_id INTEGER NOT NULL,
-                    delete_at REAL NOT NULL
-                );
-                """
-            )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS louna_emojis(
-                    emoji TEXT PRIMARY KEY,
-                    weight REAL NOT NULL DEFAULT 0
-                );
-                """
-            )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS person_aliases(
-                    alias TEXT PRIMARY KEY,
-                    id INTEGER NOT NULL
-                );
-                """
-            )
-            # huge shuffle just to change the primary key fr
-            try:
-                await cur.executescript(
-                    """ALTER TABLE params ADD COLUMN using_new_person_aliases INTEGER DEFAULT 0;
-                    """
-                )
-            except aiosqlite.OperationalError:
-                pass
-            await cur.execute(
-                """SELECT using_new_person_aliases FROM params;
-                """
-            )
-            [[using_new_person_aliases]] = list(await cur.fetchall())
-            if not using_new_person_aliases:
-                await cur.executescript(
-                    """CREATE TABLE IF NOT EXISTS new_person_aliases(
-                        alias TEXT NOT NULL,
-                        id INTEGER NOT NULL,
-                        PRIMARY KEY(alias, id)
-                    );
-                    INSERT INTO new_person_aliases SELECT * FROM person_aliases;
-                    DROP TABLE person_aliases;
-                    ALTER TABLE new_person_aliases RENAME TO person_aliases;
-                    UPDATE params SET using_new_person_aliases = 1;
-                    """
-                )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS ticker_hashes(
-                    command TEXT NOT NULL,
-                    hash INTEGER NOT NULL,
-                    delete_at REAL NOT NULL,
-                    PRIMARY KEY(command, hash)
-                )"""
-            )
-            try:
-                await cur.executescript(
-                    """ALTER TABLE likers ADD COLUMN enabled_in_cw INTEGER DEFAULT 0;
-                    """
-                )
-            except aiosqlite.OperationalError:
-                pass
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS user_stacks(
-                    user_id INTEGER NOT NULL,
-                    idx INTEGER NOT NULL,
-                    value TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    PRIMARY KEY(user_id, idx)
-                )"""
-            )
-            try:
-                await cur.executescript(
-                    """ALTER TABLE person_aliases ADD COLUMN chitter_message_id INTEGER DEFAULT NULL;
-                    """
-                )
-            except aiosqlite.OperationalError:
-                pass
-            # await cur.executescript(
-            #     """CREATE TABLE IF NOT EXISTS user_settings(
-            #         id INTEGER PRIMARY KEY,
-            #         proxied INTEGER NOT NULL DEFAULT 0,
-            #         autoliking_after REAL,
-            #         cw_allowed INTEGER NOT NULL DEFAULT 0,
-            #     )"""
-            # )
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS mjaus(
-                    mjau TEXT PRIMARY KEY
-                );
-                """
-            )
+        await migrate(self.db, main_migrations, "main")
 
     async def backup_database(self):
         backup_dir = Path.cwd() / "backups"
         backup_dir.mkdir(exist_ok=True)
-        previous_backups = sorted(list(backup_dir.glob("backup-*.db")))
+        previous_backups = backups.snapshots(backup_dir)
         now = datetime.now()
         # skip if the last backup was less than 24 hours ago
         if previous_backups:
-            _, _, iso = previous_backups[-1].stem.partition("-")
-            last_backup = datetime.fromisoformat(iso)
+            last_backup = backups.snapshot_time(previous_backups[-1])
             if last_backup + timedelta(days=1) > now:
-                logging.info(f"Skipping backup as one exists from {last_backup}")
+                logging.debug(f"Skipping backup as one exists from {last_backup}")
                 return
-        # allow only 8 live backups at a time
-        for i in range(len(previous_backups) - 7):
-            old_backup = previous_backups[i]
-            old_backup.unlink()
-        # create new backup
-        backup_ts = now.isoformat(timespec="seconds")
-        new_backup = backup_dir / f"backup-{backup_ts}.db"
-        logging.info(f"creating backup at {new_backup}")
-        async with aiosqlite.connect(new_backup) as conn:
-            await self.db.backup(conn)
-        logging.info("backup successful")
-        await self.webhook.send(file=discord.File(new_backup))
-
-    async def refresh_aliases(self):
-        self.person_aliases = {}
-        self.inv_person_aliases = {}
-        async with self.cursor() as cur:
-            await cur.execute("""SELECT alias, id, chitter_message_id FROM person_aliases;""")
-            aliases = await cur.fetchall()
-            for alias, user_id, chitter_message_id in aliases:
-                self.person_aliases.setdefault(alias, []).append(user_id)
-                self.inv_person_aliases.setdefault(user_id, []).append(alias)
-                if chitter_message_id is None:
-                    logging.info(f"Catching others up to {user_id}'s alias '{alias}'")
-                    message_id = await self.chitter_send("aliases", discord.Object(user_id), alias)
-                    await cur.execute(
-                        """UPDATE person_aliases SET chitter_message_id = ? WHERE alias = ? AND id = ?""",
-                        [message_id, alias, user_id]
-                    )
+        logging.info("creating backup")
+        async with self.readers.connection() as reader:
+            new_backup = await backups.take_snapshot(reader, backup_dir, now=now)
+        logging.info(f"backup successful: {new_backup.name} ({new_backup.stat().st_size} bytes)")
+        async for filename, data in backups.split_for_upload(new_backup):
+            await self.shipper.upload(filename, data)
 
-    async def setup_hook(self) -> None:
-        self.webhook = discord.Webhook.from_url(self.webhook_url, client=self)
+    @tasks.loop(hours=1)
+    async def backup_loop(self):
+        # a failed backup shouldn't stop the next one from being attempted
+        try:
+            await self.backup_database()
+        except Exception as e:
+            logging.exception("backup failed")
+            self.shipper.error(e, "Backup failed", "The hourly backup loop")
+
+    @backup_loop.before_loop
+    async def before_backup_loop(self):
+        await self.wait_until_ready()
+
+    def add_alias(self, alias: str, user_id: int) -> None:
+        """Records an alias that was just inserted into `person_aliases`"""
+        self.person_aliases.setdefault(alias, []).append(user_id)
+        self.inv_person_aliases.setdefault(user_id, []).append(alias)
+        self.user_index.add_alias(alias, user_id)
+        count, hashes = self.aliases_fingerprint
+        self.aliases_fingerprint = (count + 1, hashes + alias_hash(user_id, alias))
+
+    def remove_alias(self, alias: str, user_id: int) -> None:
+        """Forgets an alias that was just deleted from `person_aliases`"""
+        for mapping, key, value in [
+            (self.person_aliases, alias, user_id),
+            (self.inv_person_aliases, user_id, alias),
+        ]:
+            values = mapping.get(key, [])
+            if value in values:
+                values.remove(value)
+            if not values:
+                mapping.pop(key, None)
+        self.user_index.remove_alias(alias, user_id)
+        count, hashes = self.aliases_fingerprint
+        self.aliases_fingerprint = (count - 1, hashes - alias_hash(user_id, alias))
+
+    async def refresh_aliases(self, *, force: bool = False):
+        """Reloads the alias maps, unless the table hasn't changed since they were loaded"""
+        async with self.cursor(readonly=True) as cur:
+            await cur.execute("""SELECT count(*), coalesce(sum(alias_hash(id, alias)), 0) FROM person_aliases;""")
+            fingerprint = tuple(await cur.fetchone() or ())
+            if force or fingerprint != self.aliases_fingerprint:
+                await cur.execute("""SELECT alias, id FROM person_aliases;""")
+                person_aliases: dict[str, list[int]] = {}
+                inv_person_aliases: dict[int, list[str]] = {}
+                for alias, user_id in await cur.fetchall():
+                    person_aliases.setdefault(alias, []).append(user_id)
+                    inv_person_aliases.setdefault(user_id, []).append(alias)
+                self.person_aliases = person_aliases
+                self.inv_person_aliases = inv_person_aliases
+                self.user_index.load_aliases(person_aliases)
+                self.aliases_fingerprint = fingerprint
+                logging.info(f"Loaded {len(person_aliases)} aliases")
+
+            await cur.execute("""SELECT alias, id FROM person_aliases WHERE chitter_message_id IS NULL;""")
+            missing = list(await cur.fetchall())
+        if missing:
+            await self.catch_up_aliases(missing)
 
+    async def catch_up_aliases(self, missing: list[tuple[str, int]]):
+        """Queues aliases that never made it to bot-chitter.
+
+        Ones that are still waiting in the outbox are coalesced, not sent twice.
+        """
+        for alias, user_id in missing:
+            await self.chitter_send("aliases", alias_key(user_id, alias), discord.Object(user_id), alias)
+        logging.info(f"Catching others up to {len(missing)} aliases")
+
+    async def on_chitter_sent(self, table_name: str, key: str, message_id: int) -> None:
+        if table_name != "aliases":
+            return
+        user_id, alias = key.split(" ", 1)
+        async with self.cursor() as cur:
+            await cur.execute(
+                """UPDATE person_aliases SET chitter_message_id = ? WHERE alias = ? AND id = ?;""",
+                [message_id, alias, int(user_id)]
+            )
+
+    async def fetch_owners(self) -> None:
         app_info = await self.application_info()
         owner_id = app_info.owner.id
         self.owner_ids = {  # pyright: ignore[reportIncompatibleVariableOverride]
@@ -334,33 +362,106 @@ class OliviaBot(commands.Bot):
             config.tester_bot_id,
         }
 
-        await self.backup_database()
-        await self.perform_migrations()
+    async def prepare_database(self) -> None:
+        await self.create_function("alias_hash", 2, alias_hash, deterministic=True)
+        await self.startup.timed("migrations", self.perform_migrations())
+        await self.startup.timed("settings", self.settings.load())
 
-        async with self.cursor() as cur:
-            await cur.execute("""SELECT user_id FROM auto_olivias;""")
-            olivias = await cur.fetchall()
-            for [olivia] in olivias:
-                self.owner_ids.add(olivia)
-        
-        for extension in self.activated_extensions:
-            await self.load_extension(extension)
+    async def setup_hook(self) -> None:
+        self.webhook = discord.Webhook.from_url(self.webhook_url, client=self)
+        self.shipper.start()
+
+        # the network round-trip overlaps with the disk work
+        await asyncio.gather(
+            self.startup.timed("application info", self.fetch_owners()),
+            self.prepare_database(),
+        )
+        self.owner_ids |= self.settings.auto_olivias
+        self.writes.start()
+        self.backup_loop.start()
+        self.loop_monitor.start()
+
+        # extensions don't depend on each other at load time
+        await asyncio.gather(*(
+            self.startup.timed(f"load {extension}", self.load_extension(extension))
+            for extension in self.activated_extensions
+        ))
 
         guild = discord.Object(self.testing_guild_id)
         self.tree.copy_global_to(guild=guild)
+        await self.startup.timed("tree sync", self.sync_tree(guild))
+        self.startup.mark("setup hook")
+        logging.info(f"Setup finished in {ms(self.startup.phases['setup hook'][1])}")
+
+    def tree_fingerprint(self, guild: discord.abc.Snowflake | None = None) -> str:
+        """A stable hash of the payload `tree.sync` would upload"""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)),
+            key=lambda command: (command["type"], command["name"]),
+        )
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        return digest if guild is None else f"{guild.id}:{digest}"
+
+    async def sync_tree(self, guild: discord.abc.Snowflake | None = None, *, force: bool = False) -> bool:
+        """Syncs application commands to the guild, or globally, unless they
+        haven't changed since the last sync. Returns whether a sync happened."""
+        column = "global_tree_fingerprint" if guild is None else "guild_tree_fingerprint"
+        fingerprint = self.tree_fingerprint(guild)
+        async with self.cursor(readonly=True) as cur:
+            await cur.execute(f"""SELECT {column} FROM params;""")
+            row = await cur.fetchone()
+        scope = "global" if guild is None else f"guild {guild.id}"
+        if not force and row is not None and row[0] == fingerprint:
+            logging.info(f"Skipping {scope} command sync, as nothing has changed")
+            return False
+
         await self.tree.sync(guild=guild)
+        async with self.cursor() as cur:
+            await cur.execute(f"""UPDATE params SET {column} = ?;""", [fingerprint])
+        logging.info(f"Synced {scope} application commands")
+        return True
 
+    def cursor(self, *, readonly: bool = False) -> AsyncContextManager[InstrumentedCursor]:
+        """Returns a context manager to a cursor object.
 
-    def cursor(self) -> aiosqlite.context.Result[aiosqlite.Cursor]:
-        """Returns a context manager to a cursor object."""
-        return self.db.cursor()
+        Pass `readonly=True` for SELECT-only work, to run it on the read pool
+        in parallel with writes instead of queueing behind them.
+        Every statement is timed into `query_stats`.
+        """
+        site = call_site()
+        cursor = self.readers.cursor() if readonly else self.db.cursor()
+        return instrumented(cursor, self.query_stats, site)
+
+    def on_stall(self, lag: float, report: str) -> None:
+        header, _, stack = report.partition("\n")
+        logging.warning(f"Event loop stalled for {ms(lag)} ({header})")
+        # keep the end of the stack, which is where the blocking call is
+        self.shipper.log(f"Event loop stalled for {ms(lag)} ({header})\n```py\n{stack[-1500:]}\n```")
+
+    async def close(self) -> None:
+        self.loop_monitor.stop()
+        if self.shipper.flusher.is_running():
+            self.shipper.stop()
+            await self.shipper.flush()
+        await super().close()
+
+    def on_slow_query(self, sql: str, wall: float, queue: float, site: str, command: str | None) -> None:
+        source = site if command is None else f"{site} (+{command})"
+        logging.warning(f"Slow query from {source}: {wall * 1000:.1f}ms ({queue * 1000:.1f}ms queued): {sql}")
+        self.dispatch("slow_query", sql, wall, queue, site, command)
+
+    async def create_function(self, *args: Any, **kwargs: Any) -> None:
+        """Registers a user function on the writers and every reader"""
+        await self.db.create_function(*args, **kwargs)
+        await self.writes.db.create_function(*args, **kwargs)
+        await self.readers.create_function(*args, **kwargs)
     
     # These will be overridden by the chitter cog
-    async def chitter_send(self, table_name: str, *args: Any) -> int | None:
+    async def chitter_send(self, table_name: str, key: str, *args: Any):
         logging.warning("chitter_send called before initialized")
-    async def chitter_edit(self, table_name: str, message_id: int, *args: Any):
+    async def chitter_edit(self, table_name: str, key: str, *args: Any, message_id: int | None = None):
         logging.warning("chitter_edit called before initialized")
-    async def chitter_delete(self, table_name: str, message_id: int):
+    async def chitter_delete(self, table_name: str, key: str, message_id: int | None = None):
         logging.warning("chitter_delete called before initialized")
 
 
@@ -369,24 +470,72 @@ class Cog(commands.Cog):
 
 
 class Context(commands.Context[OliviaBot]):
+    # longer output than this gets cropped
+    max_messages = 4
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.error_handled = False
+        # for proxied commands, this is when the original message came in
+        self.received_at = message_received.get(time.perf_counter())
+        # set by OliviaBot.invoke and OliviaBot.record_conversion
+        self.invoked_at: float | None = None
+        self.converted_at: float | None = None
+        # spent waiting on people while converting, like picking from a disambiguator
+        self.waiting_time = 0.0
 
-    def cursor(self) -> aiosqlite.context.Result[aiosqlite.Cursor]:
+    @property
+    def converter_time(self) -> float:
+        """Time spent in checks and converters, up to the callback or the error"""
+        if self.invoked_at is None:
+            return 0.0
+        end = time.perf_counter() if self.converted_at is None else self.converted_at
+        return max(end - self.invoked_at - self.waiting_time, 0.0)
+
+    def cursor(self, *, readonly: bool = False) -> AsyncContextManager[InstrumentedCursor]:
         """Returns a context manager to a cursor object."""
-        return self.bot.cursor()
+        return self.bot.cursor(readonly=readonly)
     
     async def ack(self, message: str | None = None, emoji: str = "🫶") -> None:
+        # the reply and the reaction are rate limited separately, so send both at once
+        reaction = self.bot.outbound.submit(
+            self.channel.id, "reactions", functools.partial(self.message.add_reaction, emoji)
+        )
         if message:
-            await self.send(message)
-        await self.message.add_reaction(emoji)
+            await asyncio.gather(self.send(message), reaction)
+        else:
+            await reaction
 
     async def send(self, content: str | None = None, **kwargs) -> discord.Message:
         # - under 2000 is unchanged
-        # - over 2000 is cropped down to fit the suffix at exactly 2000 chars
-        limit = 2000
-        if content and len(content) > limit:
+        # - over 2000 is split into several messages, the last of which gets the embeds, files etc.
+        # - over that many messages, the last is cropped down to fit the suffix
+        chunks = [content] if content is None else split_message(str(content))
+        if len(chunks) > self.max_messages:
             suffix = " [... I have so much to say!]"
-            content = content[:limit - len(suffix)] + suffix
-        return await super().send(content, **kwargs)
+            chunks = chunks[:self.max_messages]
+            chunks[-1] = chunks[-1][:message_limit - len(suffix)] + suffix
+        send = super().send
+        # every chunk has to be as careful about pings, and reply to the same message
+        shared = {key: kwargs[key] for key in ("allowed_mentions", "reference", "mention_author") if key in kwargs}
+        sent = [
+            self.bot.outbound.submit(self.channel.id, "messages", functools.partial(send, chunk, **shared))
+            for chunk in chunks[:-1]
+        ]
+        sent.append(self.bot.outbound.submit(
+            self.channel.id, "messages", functools.partial(send, chunks[-1], **kwargs)
+        ))
+        # all of them at once, so a failed chunk doesn't leave the others' errors unretrieved
+        *_, last = await asyncio.gather(*sent)
+        return last
+
+    def edit_progress(self, message: discord.Message, **fields: Any) -> asyncio.Future[discord.Message]:
+        """Edits a message without waiting for it. If an earlier edit to the message
+        hasn't been sent yet, only the latest one is."""
+        future = self.bot.outbound.submit(
+            message.channel.id, "edits", functools.partial(message.edit, **fields), key=message.id
+        )
+        future.add_done_callback(log_failure)
+        return future
+
+cursor_forwarders.add(Context.cursor.__code__)
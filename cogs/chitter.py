@@ -1,17 +1,29 @@
+import abc
+import asyncio
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 import datetime
 import logging
 import re
+import sys
 import time
-from typing import Any, Callable, TypeVar, overload
+from typing import Any, AsyncIterator, Callable, Hashable, TypeVar, overload
 
+import aiohttp
 import aiosqlite
-from discord.ext import commands
+from discord.ext import commands, tasks
 import discord
 
+import config
 from bot import OliviaBot, Context, Cog
+from dispatch import message_trigger
+from migrations import chitter_migrations, migrate
 
 T = TypeVar("T")
 
+invalid_row_reaction = "\N{EXCLAMATION QUESTION MARK}\ufe0f"
+
 def get_partial_message(bot: OliviaBot, guild_id: int, channel_id: int, message_id: int) -> discord.PartialMessage:
     return bot.get_partial_messageable(channel_id, guild_id=guild_id).get_partial_message(message_id)
 
@@ -19,164 +31,635 @@ class Null:
     pass
 null = Null()
 
+@dataclass
+class ThreadState:
+    # the newest message read so far
+    last_message_id: int
+    # what the thread's message count should be, if nothing was missed
+    message_count: int
+    # the unix time of the last full read, which catches edits made while offline
+    full_read_at: int = 0
+
 AnyValue = str | float | discord.Object | discord.PartialMessage | discord.PartialEmoji | datetime.datetime | bool | Null
 
+# how a value is kept in the store: snowflakes and timestamps as ints, a
+# message as its guild, channel and message ids, an emoji as its text
+Cell = str | float | int | tuple[int, int, int] | bool | None
+
+def cell_key(kind: str, cell: Cell) -> Hashable:
+    # a message link is identified by its message alone
+    return (kind, cell[2]) if kind == "message" else (kind, cell) # type: ignore
+
+def index_key(value: AnyValue | discord.abc.Snowflake) -> Hashable:
+    """Equal values from the same kind of column share a key.
+
+    Snowflakes key by kind and id, so full users, roles, channels and messages
+    look up the same rows as the partial objects parsed from a table. Keys
+    match those of the stored cells, see `cell_key`.
+    """
+    match value:
+        case bool():
+            return ("boolean", value)
+        case float() | int():
+            return ("number", float(value))
+        case str():
+            return ("string", value)
+        case Null():
+            return ("null", None)
+        case datetime.datetime():
+            # equal to the whole seconds a stored timestamp keeps
+            return ("timestamp", value.timestamp())
+        case discord.PartialEmoji():
+            return ("emoji", str(value))
+        case discord.Object():
+            if value.type == discord.abc.GuildChannel:
+                return ("channel", value.id)
+            elif value.type == discord.User:
+                return ("user", value.id)
+            elif value.type == discord.Role:
+                return ("role", value.id)
+            raise TypeError(f"Can't look up rows by an Object of type {value.type.__name__}")
+        case discord.PartialMessage() | discord.Message():
+            return ("message", value.id)
+        case discord.User() | discord.Member() | discord.ClientUser():
+            return ("user", value.id)
+        case discord.Role():
+            return ("role", value.id)
+        case discord.abc.GuildChannel() | discord.Thread():
+            return ("channel", value.id)
+        case _:
+            raise TypeError(f"Can't look up rows by {type(value).__name__}")
+
+def cell_value(bot: OliviaBot, kind: str, cell: Cell) -> AnyValue:
+    match kind:
+        case "channel": return discord.Object(cell, type=discord.abc.GuildChannel) # type: ignore
+        case "user": return discord.Object(cell, type=discord.User) # type: ignore
+        case "role": return discord.Object(cell, type=discord.Role) # type: ignore
+        case "message": return get_partial_message(bot, *cell) # type: ignore
+        case "emoji": return discord.PartialEmoji.from_str(cell) # type: ignore
+        case "timestamp": return datetime.datetime.fromtimestamp(cell, tz=datetime.UTC) # type: ignore
+        case "null": return null
+        case _: return cell # type: ignore
+
+# rows of the same shape share one tuple of kinds
+row_kinds: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+class ChitterRow(tuple):
+    """A stored row: its kinds, followed by one cell per value.
+
+    The discord objects a row stands for are only built when asked for, by
+    `value` or `values`; the store itself holds nothing but ints, floats,
+    interned strings and tuples of those.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def pack(cls, kinds: list[str], cells: list[Cell]) -> "ChitterRow":
+        shape = tuple(kinds)
+        return cls((row_kinds.setdefault(shape, shape), *cells))
+
+    @property
+    def kinds(self) -> tuple[str, ...]:
+        return self[0]
+
+    @property
+    def width(self) -> int:
+        return len(self) - 1
+
+    def cell(self, column: int) -> Cell:
+        return self[column + 1]
+
+    def key(self, column: int) -> Hashable:
+        return cell_key(self[0][column], self[column + 1])
+
+    def value(self, bot: OliviaBot, column: int) -> AnyValue:
+        return cell_value(bot, self[0][column], self[column + 1])
+
+    def values(self, bot: OliviaBot) -> list[AnyValue]:
+        return [cell_value(bot, kind, cell) for kind, cell in zip(self[0], self[1:])]
+
+class ColumnIndex:
+    """The ids of a table's rows, by the value in one of their columns"""
+    def __init__(self, column: int) -> None:
+        self.column = column
+        self.entries: dict[Hashable, set[int]] = {}
+
+    def add(self, message_id: int, row: ChitterRow) -> None:
+        if self.column < row.width:
+            self.entries.setdefault(row.key(self.column), set()).add(message_id)
+
+    def remove(self, message_id: int, row: ChitterRow) -> None:
+        if self.column < row.width:
+            key = row.key(self.column)
+            ids = self.entries.get(key)
+            if ids is not None:
+                ids.discard(message_id)
+                if not ids:
+                    del self.entries[key]
+
+    def get(self, value: AnyValue | discord.abc.Snowflake) -> set[int]:
+        return self.entries.get(index_key(value), set())
+
+    def describe(self) -> str:
+        largest = max(map(len, self.entries.values()), default=0)
+        return f"column {self.column}: {len(self.entries)} distinct values, at most {largest} rows each"
+
+escape_pattern = re.compile(r'\\[^a-zA-Z0-9]|\\[nrt0]|\\x[0-7][0-9a-fA-F]')
+
+def unescape(m: re.Match[str]) -> str:
+    match list(m.group()):
+        case ["\\", "n"]: return "\n"
+        case ["\\", "r"]: return "\r"
+        case ["\\", "t"]: return "\t"
+        case ["\\", "0"]: return "\0"
+        case ["\\", "x", hi, lo]: return chr(int(hi + lo, 16))
+        case ["\\", other]: return other
+        case _: raise RuntimeError("unreachable")
+
+# what serialize_string escapes, so it parses back to the same string
+string_escapes = str.maketrans({
+    '"': '\\"',
+    '\\': '\\\\',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\t': '\\t',
+    '\0': '\\0',
+} | {
+    # things that may or may not be relevant for discord 
+    c: '\\' + c
+    for c in "*`|~-@#[]()/"
+})
+
+# One alternative per kind of value, tried in order, after skipping whitespace.
+# The outer group of each alternative is named after its kind.
+token_pattern = re.compile(
+    r'[ \r\n\t]*(?:'
+    fr'(?P<string>`*"(?P<string_body>(?:[^\\"]|{escape_pattern.pattern})*)"`*)'
+    r'|(?P<number>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)'
+    r'|(?P<channel><#(?P<channel_id>[0-9]+)>)'
+    r'|(?P<user><@(?P<user_id>[0-9]+)>)'
+    r'|(?P<role><@&(?P<role_id>[0-9]+)>)'
+    r'|(?P<message>https://discord.com/channels/(?P<message_guild>[0-9]+)/(?P<message_channel>[0-9]+)/(?P<message_id>[0-9]+))'
+    r'|(?P<emoji><a?:[a-zA-Z_0-9]+:[0-9]+>)'
+    r'|(?P<timestamp><t:(?P<timestamp_value>[0-9]+)(?::[dDtTfFR])?>)'
+    r'|(?P<boolean>[✅❌])'
+    r'|(?P<null>🦖)'
+    r')'
+)
+
+def token_cell(token: re.Match[str]) -> Cell:
+    match token.lastgroup:
+        case "string": return sys.intern(escape_pattern.sub(unescape, token["string_body"]))
+        case "number": return float(token["number"])
+        case "channel": return int(token["channel_id"])
+        case "user": return int(token["user_id"])
+        case "role": return int(token["role_id"])
+        case "message": return (int(token["message_guild"]), int(token["message_channel"]), int(token["message_id"]))
+        case "emoji": return sys.intern(token["emoji"])
+        case "timestamp": return int(token["timestamp_value"])
+        case "boolean": return token["boolean"] == "✅"
+        case "null": return None
+        case _: raise RuntimeError("unreachable")
+
+def parse_chitter_row(row: str) -> ChitterRow | None:
+    kinds = []
+    cells = []
+    pos = 0
+    # trailing whitespace makes a row invalid, as nothing can follow it
+    while pos < len(row):
+        token = token_pattern.match(row, pos)
+        if token is None:
+            return None
+        kinds.append(token.lastgroup)
+        cells.append(token_cell(token))
+        pos = token.end()
+    # A row must have 1 or more values
+    if len(cells) == 0:
+        return None
+    return ChitterRow.pack(kinds, cells)
+
+# KnownTable.apply runs explicit transactions on the one chitter connection, and
+# any statement run on it in the meantime would be part of them, so writes take turns
+chitter_lock = asyncio.Lock()
+
+@asynccontextmanager
+async def chitter_cursor(bot: OliviaBot) -> AsyncIterator[aiosqlite.Cursor]:
+    """A cursor to the chitter database, held by one user at a time, see `chitter_lock`"""
+    async with chitter_lock:
+        async with bot.chitter_db.cursor() as cur:
+            yield cur
+
 class ChitterBase:
     def __init__(self, bot: OliviaBot) -> None:
         self.bot = bot
 
-    def parse_string(self, string: str, transformer: Callable[[str], T] = lambda x: x) -> tuple[T, str] | None:
-        escapes = r'\\[^a-zA-Z0-9]|\\[nrt0]|\\x[0-7][0-9a-fA-F]'
-        pattern = fr'`*"((?:[^\\"]|{escapes})*)"`*'
-        if match := re.match(pattern, string):
-            def unescaper(m: re.Match[str]) -> str:
-                match list(m.group()):
-                    case ["\\", "n"]: return "\n"
-                    case ["\\", "r"]: return "\r"
-                    case ["\\", "t"]: return "\t"
-                    case ["\\", "0"]: return "\0"
-                    case ["\\", "x", hi, lo]: return chr(int(hi + lo, 16))
-                    case ["\\", other]: return other
-                    case _: raise RuntimeError("unreachable")
-            return transformer(re.sub(escapes, unescaper, match.group(1))), string[match.end():]
-
-    def parse_number(self, string: str, transformer: Callable[[str], T] = float) -> tuple[T, str] | None:
-        if match := re.match(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?', string):
-            return transformer(match.group()), string[match.end():]
-
-    def parse_channel(self, string: str, transformer: Callable[[int], T] = lambda x: discord.Object(x, type=discord.abc.GuildChannel)) -> tuple[T, str] | None:
-        if match := re.match(r'<#([0-9]+)>', string):
-            return transformer(int(match.group(1))), string[match.end():]
-
-    def parse_user(self, string: str, transformer: Callable[[int], T] = lambda x: discord.Object(x, type=discord.User)) -> tuple[T, str] | None:
-        if match := re.match(r'<@([0-9]+)>', string):
-            return transformer(int(match.group(1))), string[match.end():]
-
-    def parse_role(self, string: str, transformer: Callable[[int], T] = lambda x: discord.Object(x, type=discord.Role)) -> tuple[T, str] | None:
-        if match := re.match(r'<@&([0-9]+)>', string):
-            return transformer(int(match.group(1))), string[match.end():]
-
-    def parse_message(self, string: str, transformer: Callable[[OliviaBot, int, int, int], T] = get_partial_message) -> tuple[T, str] | None:
-        if match := re.match(r'https://discord.com/channels/([0-9]+)/([0-9]+)/([0-9]+)', string):
-            return transformer(self.bot, *map(int, match.group(1, 2, 3))), string[match.end():]
-
-    def parse_emoji(self, string: str, transformer: Callable[[str], T] = discord.PartialEmoji.from_str) -> tuple[T, str] | None:
-        if match := re.match(r'<a?:[a-zA-Z_0-9]+:[0-9]+>', string):
-            return transformer(match.group()), string[match.end():]
-
-    def parse_timestamp(self, string: str, transformer: Callable[[int], T] = lambda t: datetime.datetime.fromtimestamp(t, tz=datetime.UTC)) -> tuple[T, str] | None:
-        if match := re.match(r'<t:([0-9]+)(?::[dDtTfFR])?>', string):
-            return transformer(int(match.group(1))), string[match.end():]
-
-    def parse_boolean(self, string: str) -> tuple[bool, str] | None:
-        if string.startswith("✅") or string.startswith("❌"):
-            return string[0] == "✅", string[1:]
-    
-    def parse_null(self, string: str) -> tuple[Null, str] | None:
-        if string.startswith("🦖"):
-            return null, string[1:]
+    def token_value(self, token: re.Match[str]) -> AnyValue:
+        return cell_value(self.bot, token.lastgroup, token_cell(token)) # type: ignore
 
     def parse_generic_row(self, row: str) -> list[AnyValue] | None:
-        results = []
-        while row:
-            row = row.lstrip(" \r\n\t")
-            parsed = None
-            for option in [
-                self.parse_string,
-                self.parse_number,
-                self.parse_channel,
-                self.parse_user,
-                self.parse_role,
-                self.parse_message,
-                self.parse_emoji,
-                self.parse_timestamp,
-                self.parse_boolean,
-                self.parse_null
-            ]:
-                val = option(row)
-                if val is not None:
-                    parsed, row = val
-                    break
-            if parsed is None:
-                return None
-            else:
-                results.append(parsed)
-        # A row must have 1 or more values
-        if len(results) == 0:
-            return None
-        return results
+        parsed = parse_chitter_row(row)
+        return None if parsed is None else parsed.values(self.bot)
 
-    def parse_row_by_schema(self, row: str, parsers: list[Callable[[str], tuple[AnyValue, str] | None]]) -> list[AnyValue] | None:
+    def parse_row_by_schema(self, row: str, kinds: list[str]) -> list[AnyValue] | None:
+        """Parses the values of the given kinds, like "user" or "string", ignoring anything after them"""
         results = []
-        for parser in parsers:
-            row = row.lstrip(" \r\n\t")
-            parsed = None
-            val = parser(row)
-            if val is not None:
-                parsed, row = val
-            if parsed is None:
+        pos = 0
+        for kind in kinds:
+            token = token_pattern.match(row, pos)
+            if token is None or token.lastgroup != kind:
                 return None
-            else:
-                results.append(parsed)
+            results.append(self.token_value(token))
+            pos = token.end()
         # A row must have 1 or more values
         if len(results) == 0:
             return None
         return results
 
-class TimezoneChitter(ChitterBase):
+class KnownTable(ChitterBase, abc.ABC):
+    """A bot-chitter table with a schema, mirrored into a table of its own.
+
+    Subclasses give the kinds of their columns, how to turn a parsed row into
+    values (starting with the message id), and the SQL for their table. Catch-up
+    loads every row of a thread into a temporary table and reconciles it with
+    the real one in a single transaction, writing only the rows that changed.
+    Live messages, edits and deletes each run a single statement.
+    """
+    kinds: list[str]
+    create: str
+    create_incoming: str
+    load_incoming: str
+    # keeps only the newest row for each unique value
+    dedupe_incoming: str
+    # writes incoming rows that are new or changed, unless a newer row takes precedence
+    upsert_incoming: str
+    # the anti-join, deleting rows that aren't in the thread anymore
+    delete_missing: str
+    clear_incoming: str
+    # upsert_incoming for a single row
+    upsert: str
+    delete: str
+    # the column where only the newest row of each value counts, like the user of a timezone
+    key_column: int | None = None
+
     async def on_load(self):
-        async with self.bot.chitter_db.cursor() as cur:
-            await cur.executescript(
-                """CREATE TABLE IF NOT EXISTS timezones(
-                    chitter_message_id INTEGER PRIMARY KEY,
-                    user INTEGER UNIQUE NOT NULL,
-                    timezone TEXT NOT NULL
-                );
-                """
-            )
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute(self.create)
+            await cur.execute(self.create_incoming)
 
-    async def assign_row(self, message: discord.Message):
-        row = self.parse_row_by_schema(message.content, [self.parse_user, self.parse_string])
+    @abc.abstractmethod
+    def values(self, message_id: int, row: list[AnyValue]) -> tuple[Any, ...]:
+        ...
+
+    def parse(self, message: discord.Message) -> tuple[Any, ...] | None:
+        row = self.parse_row_by_schema(message.content, self.kinds)
         if row is None:
+            return None
+        return self.values(message.id, row)
+
+    async def assign_row(self, message: discord.Message):
+        values = self.parse(message)
+        async with chitter_cursor(self.bot) as cur:
+            # what it said before goes, whether it's invalid now or loses to a newer row
+            await cur.execute(self.delete, [message.id])
+            if values is not None:
+                await cur.execute(self.upsert, values)
+
+    async def delete_row(self, message_id: int):
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute(self.delete, [message_id])
+
+    async def assign_stored(self, message_id: int, row: ChitterRow) -> bool:
+        """Upserts a row from the raw store. Returns whether it fits the schema"""
+        if list(row.kinds[:len(self.kinds)]) != self.kinds:
+            return False
+        values = self.values(message_id, row.values(self.bot)[:len(self.kinds)])
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute(self.upsert, values)
+        return True
+
+    async def apply(self, messages: list[discord.Message], *, complete: bool):
+        """Writes rows from catch-up, and deletes the rest too if they're the complete thread"""
+        rows = [values for message in messages if (values := self.parse(message)) is not None]
+        if not rows and not complete:
             return
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute("""BEGIN;""")
+            try:
+                await cur.executemany(self.load_incoming, rows)
+                await cur.execute(self.dedupe_incoming)
+                deleted = 0
+                if complete:
+                    await cur.execute(self.delete_missing)
+                    deleted = cur.rowcount
+                await cur.execute(self.upsert_incoming)
+                written = cur.rowcount
+                await cur.execute(self.clear_incoming)
+                await cur.execute("""COMMIT;""")
+            except Exception:
+                await cur.execute("""ROLLBACK;""")
+                raise
+        logging.info(f"{type(self).__name__}: {written} rows written and {deleted} deleted, out of {len(rows)}")
+
+class TimezoneChitter(KnownTable):
+    kinds = ["user", "string"]
+    key_column = 0
+    create = """CREATE TABLE IF NOT EXISTS timezones(
+        chitter_message_id INTEGER PRIMARY KEY,
+        user INTEGER UNIQUE NOT NULL,
+        timezone TEXT NOT NULL
+    );
+    """
+    create_incoming = """CREATE TEMP TABLE IF NOT EXISTS incoming_timezones(
+        chitter_message_id INTEGER PRIMARY KEY,
+        user INTEGER NOT NULL,
+        timezone TEXT NOT NULL
+    );
+    """
+    load_incoming = """INSERT OR REPLACE INTO incoming_timezones VALUES (?, ?, ?);"""
+    dedupe_incoming = """DELETE FROM incoming_timezones
+        WHERE chitter_message_id NOT IN (
+            SELECT max(chitter_message_id) FROM incoming_timezones GROUP BY user
+        );
+    """
+    upsert_incoming = """INSERT OR REPLACE INTO timezones
+        SELECT * FROM incoming_timezones AS new
+        WHERE NOT EXISTS (
+            SELECT 1 FROM timezones AS old
+            WHERE old.user = new.user AND (
+                old.chitter_message_id > new.chitter_message_id
+                OR (old.chitter_message_id = new.chitter_message_id AND old.timezone = new.timezone)
+            )
+        );
+    """
+    delete_missing = """DELETE FROM timezones
+        WHERE chitter_message_id NOT IN (SELECT chitter_message_id FROM incoming_timezones);
+    """
+    clear_incoming = """DELETE FROM incoming_timezones;"""
+    upsert = """INSERT OR REPLACE INTO timezones
+        SELECT ?1, ?2, ?3
+        WHERE NOT EXISTS (SELECT 1 FROM timezones WHERE user = ?2 AND chitter_message_id > ?1);
+    """
+    delete = """DELETE FROM timezones WHERE chitter_message_id = ?;"""
+
+    def values(self, message_id: int, row: list[AnyValue]) -> tuple[Any, ...]:
         user: discord.Object
         timezone: str
         user, timezone = row # pyright: ignore[reportAssignmentType]
-        async with self.bot.chitter_db.cursor() as cur:
-            await cur.execute(
-                """INSERT OR REPLACE INTO timezones VALUES (?, ?, ?)""",
-                [message.id, user.id, timezone]
-            )
+        return message_id, user.id, timezone
 
-    async def delete_row(self, message_id: int):
-        async with self.bot.chitter_db.cursor() as cur:
-            await cur.execute(
-                """DELETE FROM timezones WHERE message_id = ?""",
-                [message_id]
-            )
-    
-    # kind of annoying to slot this in but oh well
-    async def synchronize(self, found_ids: list[int]):
-        async with self.bot.chitter_db.cursor() as cur:
+@dataclass(eq=False)
+class OutboxEntry:
+    # the row id in chitter_outbox, which is also the order entries run in
+    id: int
+    table_name: str
+    # "send", "edit" or "delete"
+    action: str
+    # identifies the row, even before it's been sent and has a message id
+    key: str
+    message_id: int | None
+    content: str | None
+    attempts: int = 0
+
+class ChitterOutbox:
+    """Writes to our own bot-chitter tables, in the background.
+
+    Entries are saved in chitter_outbox until they're done, and each table
+    runs its entries in order. Entries for a row that haven't started yet are
+    coalesced: an edit rewrites a waiting send or edit, and a delete cancels a
+    waiting send outright, so a row added and removed in quick succession
+    never reaches Discord. Failures from Discord's side are retried with
+    exponential backoff. Once a send goes through, the bot dispatches
+    `chitter_sent` with the table name, row key and new message id.
+    """
+    max_attempts = 8
+    max_backoff = 300.0
+
+    def __init__(self, bot: OliviaBot, table_ids: dict[str, int]) -> None:
+        self.bot = bot
+        self.table_ids = table_ids
+        self.queues: dict[str, deque[OutboxEntry]] = {}
+        self.in_flight: dict[str, OutboxEntry] = {}
+        self.workers: dict[str, asyncio.Task[None]] = {}
+        # message ids of rows sent since startup, for callers that haven't heard of them yet
+        self.sent: dict[tuple[str, str], int] = {}
+        # statistics
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def load(self):
+        async with chitter_cursor(self.bot) as cur:
             await cur.execute(
-                """SELECT chitter_message_id FROM timezones;"""
+                """SELECT id, table_name, action, row_key, message_id, content, attempts FROM chitter_outbox ORDER BY id;"""
             )
-            stored_ids = {int(x[0]) for x in await cur.fetchall()}
-        to_delete = stored_ids - set(found_ids)
-        for delete_id in to_delete:
+            entries = [OutboxEntry(*row) for row in await cur.fetchall()]
+        for entry in entries:
+            self.queues.setdefault(entry.table_name, deque()).append(entry)
+        for table_name in self.queues:
+            self.start(table_name)
+        if entries:
+            logging.info(f"Loaded {len(entries)} waiting bot chitter writes")
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.cancel()
+
+    def start(self, table_name: str):
+        if table_name not in self.workers:
+            self.workers[table_name] = asyncio.create_task(self.drain(table_name))
+
+    def waiting(self, table_name: str, key: str) -> list[OutboxEntry]:
+        """Entries for the row that haven't started yet"""
+        in_flight = self.in_flight.get(table_name)
+        return [
+            entry for entry in self.queues.get(table_name, ())
+            if entry.key == key and entry is not in_flight
+        ]
+
+    async def rewrite(self, entry: OutboxEntry, content: str):
+        entry.content = content
+        self.coalesced += 1
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute("""UPDATE chitter_outbox SET content = ? WHERE id = ?;""", [content, entry.id])
+
+    async def discard(self, table_name: str, entries: list[OutboxEntry]):
+        queue = self.queues[table_name]
+        for entry in entries:
+            queue.remove(entry)
+        self.coalesced += len(entries)
+        async with chitter_cursor(self.bot) as cur:
+            await cur.executemany("""DELETE FROM chitter_outbox WHERE id = ?;""", [(entry.id,) for entry in entries])
+
+    async def append(self, table_name: str, action: str, key: str, message_id: int | None, content: str | None):
+        if message_id is None:
+            message_id = self.sent.get((table_name, key))
+        async with chitter_cursor(self.bot) as cur:
             await cur.execute(
-                """DELETE FROM timezones WHERE message_id = ?""",
-                [delete_id]
+                """INSERT INTO chitter_outbox(table_name, action, row_key, message_id, content) VALUES (?, ?, ?, ?, ?);""",
+                [table_name, action, key, message_id, content]
             )
+            entry_id = cur.lastrowid
+        assert entry_id is not None
+        entry = OutboxEntry(entry_id, table_name, action, key, message_id, content)
+        self.queues.setdefault(table_name, deque()).append(entry)
+        self.start(table_name)
+
+    async def send(self, table_name: str, key: str, content: str):
+        waiting = self.waiting(table_name, key)
+        # sending the same row twice only sends the newer content
+        for entry in waiting:
+            if entry.action in ("send", "edit"):
+                if entry.content == content:
+                    return
+                return await self.rewrite(entry, content)
+        in_flight = self.in_flight.get(table_name)
+        in_flight = in_flight if in_flight is not None and in_flight.key == key else None
+        # already on its way with nothing after it, like a row queued again after a reconnect
+        if not waiting and in_flight is not None and in_flight.action in ("send", "edit") and in_flight.content == content:
+            return
+        if in_flight is not None and in_flight.action == "send":
+            return await self.append(table_name, "edit", key, None, content)
+        await self.append(table_name, "send", key, None, content)
+
+    async def edit(self, table_name: str, key: str, content: str, message_id: int | None = None):
+        for entry in self.waiting(table_name, key):
+            if entry.action in ("send", "edit"):
+                return await self.rewrite(entry, content)
+        await self.append(table_name, "edit", key, message_id, content)
+
+    async def delete(self, table_name: str, key: str, message_id: int | None = None):
+        waiting = self.waiting(table_name, key)
+        unsent = any(entry.action == "send" for entry in waiting)
+        await self.discard(table_name, [entry for entry in waiting if entry.action in ("send", "edit")])
+        if unsent:
+            # it never existed as far as anyone else knows
+            return
+        await self.append(table_name, "delete", key, message_id, None)
+
+    async def run(self, entry: OutboxEntry) -> int | None:
+        thread = self.bot.get_channel(self.table_ids[entry.table_name])
+        if not isinstance(thread, discord.Thread):
+            raise RuntimeError(f"Bad thread id set for {entry.table_name} table")
+        if entry.action == "send":
+            assert entry.content is not None
+            if entry.attempts:
+                # an earlier attempt may have gone through without us hearing back
+                async for message in thread.history(limit=50):
+                    if message.author == self.bot.user and message.content == entry.content:
+                        return message.id
+            message = await thread.send(entry.content, allowed_mentions=discord.AllowedMentions.none())
+            return message.id
+        if entry.message_id is None:
+            entry.message_id = self.sent.get((entry.table_name, entry.key))
+        if entry.message_id is None:
+            logging.warning(f"Can't {entry.action} {entry.key} in {entry.table_name}, it was never sent")
+            return None
+        partial = thread.get_partial_message(entry.message_id)
+        try:
+            if entry.action == "edit":
+                await partial.edit(content=entry.content)
+            else:
+                await partial.delete()
+        except discord.NotFound:
+            # somebody got to it first
+            pass
+        return None
+
+    def retryable(self, error: Exception) -> bool:
+        if isinstance(error, discord.HTTPException):
+            return error.status >= 500 or error.status == 429
+        return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+    async def drain(self, table_name: str):
+        await self.bot.wait_until_ready()
+        queue = self.queues[table_name]
+        try:
+            while queue:
+                entry = queue[0]
+                self.in_flight[table_name] = entry
+                try:
+                    message_id = await self.run(entry)
+                except Exception as e:
+                    del self.in_flight[table_name]
+                    if self.retryable(e) and entry.attempts + 1 < self.max_attempts:
+                        entry.attempts += 1
+                        self.retried += 1
+                        async with chitter_cursor(self.bot) as cur:
+                            await cur.execute(
+                                """UPDATE chitter_outbox SET attempts = ? WHERE id = ?;""",
+                                [entry.attempts, entry.id]
+                            )
+                        delay = min(2.0 ** entry.attempts, self.max_backoff)
+                        logging.warning(f"Failed to {entry.action} {entry.key} in {table_name}, retrying in {delay:.0f}s: {e}")
+                        # the entry can be coalesced away in the meantime
+                        await asyncio.sleep(delay)
+                        continue
+                    self.failed += 1
+                    logging.exception(f"Giving up on {entry.action} {entry.key} in {table_name}")
+                    self.bot.shipper.error(e, f"Bot chitter {entry.action} failed", f"{entry.key} in {table_name}")
+                    message_id = None
+                else:
+                    del self.in_flight[table_name]
+                queue.popleft()
+                async with chitter_cursor(self.bot) as cur:
+                    await cur.execute("""DELETE FROM chitter_outbox WHERE id = ?;""", [entry.id])
+                    if message_id is not None:
+                        # later edits and deletes of the row can find it now
+                        await cur.execute(
+                            """UPDATE chitter_outbox SET message_id = ? WHERE table_name = ? AND row_key = ? AND message_id IS NULL;""",
+                            [message_id, table_name, entry.key]
+                        )
+                if entry.action == "delete":
+                    self.sent.pop((table_name, entry.key), None)
+                if message_id is not None:
+                    self.sent[table_name, entry.key] = message_id
+                    for later in queue:
+                        if later.key == entry.key and later.message_id is None:
+                            later.message_id = message_id
+                    self.bot.dispatch("chitter_sent", table_name, entry.key, message_id)
+        finally:
+            del self.workers[table_name]
 
 class BotChitter(Cog, ChitterBase):
     def __init__(self, bot: OliviaBot):
         self.bot = bot
         self.own_tables = { 1394575943049281626: self.serialize_alias_row }
         self.own_table_aliases = { "aliases": 1394575943049281626 }
-        self.known_tables = { 1394562583348121620: TimezoneChitter(bot) }
-        # Is is that bad to refill the store on each login?
-        self.raw_chitter_store: dict[int, dict[int, list[AnyValue]]] = {}
+        self.known_tables: dict[int, KnownTable] = { 1394562583348121620: TimezoneChitter(bot) }
+        # saved to chitter_rows, so logging in only needs to read what's new
+        self.raw_chitter_store: dict[int, dict[int, ChitterRow]] = {}
+        self.thread_states: dict[int, ThreadState] = {}
+        # table id -> column -> index, kept up to date by store_row and unstore_row
+        self.indexed_columns = {
+            1394575943049281626: [0], # aliases by user
+            1394562583348121620: [0], # timezones by user
+        }
+        self.indexes: dict[int, dict[int, ColumnIndex]] = {}
+        # on_ready fires again on reconnects, possibly while still catching up
+        self.catch_up_lock = asyncio.Lock()
+        # threads being read by `sync_thread`, which counts their messages itself
+        self.syncing: Counter[int] = Counter()
+        self.catch_up_concurrency: int = getattr(config, "chitter_concurrency", 4)
+        # how stale a thread's rows may get from edits missed while offline, see `sync_thread`
+        self.full_read_interval = 6 * 60 * 60
+        # bots get told about their invalid rows slowly, rather than in one burst
+        self.invalid_rows: asyncio.Queue[discord.Message] = asyncio.Queue()
+        self.invalid_row_interval = 2.0
+        self.reaction_worker: asyncio.Task[None] | None = None
+        self.outbox = ChitterOutbox(bot, self.own_table_aliases)
+        # serialize_generic_row looks these up by the value's exact type
+        self.serializers: dict[type, Callable[[Any], str]] = {
+            str: self.serialize_string,
+            bool: self.serialize_bool,
+            # note: seems like the `float` in the type alias actually desugared to `float | int`
+            float: self.serialize_number,
+            int: self.serialize_number,
+            discord.Object: self.serialize_object,
+            discord.PartialMessage: self.serialize_message,
+            discord.PartialEmoji: self.serialize_emoji,
+            datetime.datetime: self.serialize_timestamp,
+            Null: self.serialize_null,
+        }
 
     async def cog_load(self):
         self.original_chitter_send = self.bot.chitter_send
@@ -186,68 +669,101 @@ class BotChitter(Cog, ChitterBase):
         self.bot.chitter_edit = self.chitter_edit
         self.bot.chitter_delete = self.chitter_delete
 
+        await migrate(self.bot.chitter_db, chitter_migrations, "chitter")
         for known_table in self.known_tables.values():
             await known_table.on_load()
+        await self.load_store()
+        await self.outbox.load()
+        self.reaction_worker = asyncio.create_task(self.react_to_invalid_rows())
+        self.catch_up_loop.start()
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
+        await self.catch_up()
+
+    @tasks.loop(hours=1)
+    async def catch_up_loop(self):
+        # the first iteration comes right after on_ready has caught up
+        if self.catch_up_loop.current_loop == 0:
+            return
+        await self.catch_up()
+
+    @catch_up_loop.before_loop
+    async def before_catch_up_loop(self):
+        await self.bot.wait_until_ready()
+
+    async def catch_up(self) -> None:
+        """Syncs every thread, reading the stale ones in full"""
         chitter = self.bot.get_channel(self.bot.bot_chitter_id)
         if not isinstance(chitter, discord.ForumChannel):
             logging.warning("bot-chitter channel is not a forum channel")
         if not isinstance(chitter, (discord.TextChannel, discord.ForumChannel)):
             return
-        
-        logging.info("Catching up on bot chitter")
-        for thread in chitter.threads:
-            await self.assign_history(thread)
-        logging.info("All caught up")
+        if self.catch_up_lock.locked():
+            logging.info("Already catching up on bot chitter")
+            return
+
+        async with self.catch_up_lock:
+            threads = chitter.threads
+            logging.info(f"Catching up on bot chitter ({len(threads)} threads, {self.catch_up_concurrency} at a time)")
+            start = time.perf_counter()
+            semaphore = asyncio.Semaphore(self.catch_up_concurrency)
+            done = 0
+
+            async def catch_up(thread: discord.Thread) -> int:
+                nonlocal done
+                async with semaphore:
+                    thread_start = time.perf_counter()
+                    count = await self.sync_thread(thread)
+                done += 1
+                logging.info(
+                    f"Caught up on {thread.name} ({count} messages read in {time.perf_counter() - thread_start:.1f}s), "
+                    f"{done}/{len(threads)} threads done"
+                )
+                return count
+
+            results = await asyncio.gather(*map(catch_up, threads), return_exceptions=True)
+            for thread, result in zip(threads, results):
+                if isinstance(result, BaseException):
+                    logging.error(f"Failed to catch up on {thread.name}", exc_info=result)
+            total = sum(result for result in results if isinstance(result, int))
+            logging.info(
+                f"All caught up: {total} messages from {len(threads)} threads in {time.perf_counter() - start:.1f}s, "
+                f"{self.invalid_rows.qsize()} invalid rows to react to"
+            )
 
     async def cog_unload(self) -> None:
         self.bot.chitter_send = self.original_chitter_send
         self.bot.chitter_edit = self.original_chitter_edit
         self.bot.chitter_delete = self.original_chitter_delete
+        if self.reaction_worker is not None:
+            self.reaction_worker.cancel()
+        self.catch_up_loop.cancel()
+        self.outbox.stop()
 
-    async def chitter_send(self, table_name: str, *args: Any) -> int | None:
-        table_id = self.own_table_aliases[table_name]
-        serialized = self.own_tables[table_id](*args)
-        thread = self.bot.get_channel(table_id)
-        if not isinstance(thread, discord.Thread):
-            logging.warning(f"Bad thread id set for {table_name} table")
-            return None
-        try:
-            msg = await thread.send(serialized, allowed_mentions=discord.AllowedMentions.none())
-        except discord.HTTPException:
-            return None
-        return msg.id
+    async def react_to_invalid_rows(self):
+        while True:
+            message = await self.invalid_rows.get()
+            try:
+                await message.add_reaction(invalid_row_reaction)
+            except discord.HTTPException:
+                pass
+            await asyncio.sleep(self.invalid_row_interval)
 
-    async def chitter_edit(self, table_name: str, message_id: int, *args: Any):
+    async def chitter_send(self, table_name: str, key: str, *args: Any):
+        """Queues a new row, see `ChitterOutbox`"""
         table_id = self.own_table_aliases[table_name]
-        serialized = self.own_tables[table_id](*args)
-        thread = self.bot.get_channel(table_id)
-        if not isinstance(thread, discord.Thread):
-            raise RuntimeError("Bad table?")
-        await thread.get_partial_message(message_id).edit(content = serialized)
-        
-    async def chitter_delete(self, table_name: str, message_id: int):
+        await self.outbox.send(table_name, key, self.own_tables[table_id](*args))
+
+    async def chitter_edit(self, table_name: str, key: str, *args: Any, message_id: int | None = None):
         table_id = self.own_table_aliases[table_name]
-        thread = self.bot.get_channel(table_id)
-        if not isinstance(thread, discord.Thread):
-            raise RuntimeError("Bad table?")
-        await thread.get_partial_message(message_id).delete()
+        await self.outbox.edit(table_name, key, self.own_tables[table_id](*args), message_id)
+
+    async def chitter_delete(self, table_name: str, key: str, message_id: int | None = None):
+        await self.outbox.delete(table_name, key, message_id)
 
     def serialize_string(self, string: str, backticks = 0) -> str:
-        contents = string.translate({
-            ord('"'): '\\"',
-            ord('\\'): '\\\\',
-            ord('\n'): '\\n',
-            ord('\r'): '\\r',
-            ord('\t'): '\\t',
-            ord('\0'): '\\0',
-        } | {
-            # things that may or may not be relevant for discord 
-            ord(c): '\\' + c
-            for c in "*`|~-@#[]()/"
-        })
+        contents = string.translate(string_escapes)
         return f'{backticks * "`"}"{contents}"{backticks * "`"}'
     
     serialize_bool = lambda _, b: "❌✅"[b]
@@ -255,85 +771,286 @@ class BotChitter(Cog, ChitterBase):
     def serialize_channel(self, c: discord.abc.Snowflake): return f"<#{c.id}>"
     def serialize_user(self, u: discord.abc.Snowflake): return f"<@{u.id}>"
     def serialize_role(self, r: discord.abc.Snowflake): return f"<@&{r.id}>"
-    def serialize_message(self, m: discord.PartialMessage | discord.Message): return m.jump_url
+    def serialize_message(self, m: discord.PartialMessage | discord.Message):
+        # the guild of a parsed message may not be cached, but its channel still knows the id
+        guild_id = m.guild.id if m.guild is not None else getattr(m.channel, "guild_id", None)
+        return f"https://discord.com/channels/{guild_id or '@me'}/{m.channel.id}/{m.id}"
     serialize_emoji = str
     def serialize_timestamp(self, dt: datetime.datetime): return discord.utils.format_dt(dt)
     serialize_null = lambda _, _n: "🦖"
 
+    def serialize_object(self, o: discord.Object) -> str:
+        if o.type == discord.abc.GuildChannel:
+            return self.serialize_channel(o)
+        elif o.type == discord.User:
+            return self.serialize_user(o)
+        elif o.type == discord.Role:
+            return self.serialize_role(o)
+        raise RuntimeError("unreachable")
+
     def serialize_generic_row(self, *items: AnyValue) -> str:
         '''This is meant to be used for rows parsed with parse_generic_row.
         '''
+        serializers = self.serializers
         parts: list[str] = []
         for item in items:
-            match item:
-                case str():
-                    parts.append(self.serialize_string(item))
-                case bool(): # this needs to be before the int() case, due to:
-                    parts.append(self.serialize_bool(item))
-                case float() | int(): # note: seems like the `float` in the type alias actually desugared to `float | int`
-                    parts.append(self.serialize_number(item))
-                case discord.Object():
-                    if item.type == discord.abc.GuildChannel:
-                        parts.append(self.serialize_channel(item))
-                    elif item.type == discord.User:
-                        parts.append(self.serialize_user(item))
-                    elif item.type == discord.Role:
-                        parts.append(self.serialize_role(item))
-                    else:
-                        raise RuntimeError("unreachable")
-                case discord.PartialMessage():
-                    parts.append(self.serialize_message(item))
-                case discord.PartialEmoji():
-                    parts.append(self.serialize_emoji(item))
-                case datetime.datetime():
-                    parts.append(self.serialize_timestamp(item))
-                case Null():
-                    parts.append(self.serialize_null(item))
-
+            serialize = serializers.get(type(item))
+            if serialize is None:
+                # subclasses go by the closest base class there is a serializer for
+                serialize = next((serializers[base] for base in type(item).__mro__ if base in serializers), None)
+                if serialize is None:
+                    continue
+            parts.append(serialize(item))
         return " ".join(parts)
     
     def serialize_alias_row(self, user: discord.User, alias: str):
         return " ".join([self.serialize_user(user), self.serialize_string(alias)])
 
-    async def assign_history(self, thread: discord.Thread):
-        message_ids = []
-        async for message in thread.history(limit=None):
-            await self.assign_row(thread.id, message)
-            message_ids.append(message.id)
+    async def load_store(self):
+        """Loads the rows and read positions saved by previous runs"""
+        start = time.perf_counter()
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute("""SELECT table_id, last_message_id, message_count, full_read_at FROM chitter_threads;""")
+            self.thread_states = {
+                table_id: ThreadState(last_message_id, message_count, full_read_at)
+                for table_id, last_message_id, message_count, full_read_at in await cur.fetchall()
+            }
+            await cur.execute("""SELECT table_id, message_id, content FROM chitter_rows;""")
+            rows = await cur.fetchall()
+        for table_id, message_id, content in rows:
+            row = parse_chitter_row(content)
+            if row is not None:
+                self.store_row(table_id, message_id, row)
+        logging.info(
+            f"Loaded {len(rows)} bot chitter rows from {len(self.thread_states)} threads "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+    async def save_state(self, table_id: int):
+        state = self.thread_states[table_id]
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute(
+                """INSERT OR REPLACE INTO chitter_threads VALUES (?, ?, ?, ?);""",
+                [table_id, state.last_message_id, state.message_count, state.full_read_at]
+            )
+
+    async def forget_thread(self, table_id: int):
+        self.raw_chitter_store.pop(table_id, None)
+        self.indexes.pop(table_id, None)
+        self.thread_states.pop(table_id, None)
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute("""DELETE FROM chitter_rows WHERE table_id = ?;""", [table_id])
+            await cur.execute("""DELETE FROM chitter_threads WHERE table_id = ?;""", [table_id])
+
+    def counted(self, thread_id: int, messages: list[discord.Message]) -> int:
+        # a forum post's starter message shares its id, and isn't in its message count
+        return sum(message.id != thread_id for message in messages)
+
+    async def read_pages(self, thread: discord.Thread, after: int | None) -> tuple[list[discord.Message], list[discord.Message]]:
+        """Assigns messages from a thread's history a page at a time.
+
+        Returns all the messages, and the valid rows among them.
+        """
+        messages: list[discord.Message] = []
+        valid: list[discord.Message] = []
+        page: list[discord.Message] = []
+        async for message in thread.history(limit=None, after=after and discord.Object(after)):
+            page.append(message)
+            # history fetches 100 messages per request
+            if len(page) == 100:
+                valid.extend(await self.assign_rows(thread.id, page))
+                messages.extend(page)
+                page = []
+        valid.extend(await self.assign_rows(thread.id, page))
+        messages.extend(page)
+        return messages, valid
+
+    async def sync_thread(self, thread: discord.Thread, *, force: bool = False) -> int:
+        """Reads what's new in a thread since the last run. Returns the number of messages read
+
+        Messages deleted while offline show up as a difference in the thread's
+        message count, and only then is the whole thread read again. Edits
+        don't show up at all, so a thread is also read in full once its last
+        full read is `full_read_interval` seconds old.
+        """
+        self.syncing[thread.id] += 1
+        try:
+            state = self.thread_states.get(thread.id)
+            if force or state is None or time.time() - state.full_read_at >= self.full_read_interval:
+                return await self.assign_history(thread)
+            messages, valid = await self.read_pages(thread, after=state.last_message_id)
+            if thread.id in self.known_tables:
+                await self.known_tables[thread.id].apply(valid, complete=False)
+            if messages:
+                state.last_message_id = max(state.last_message_id, *(message.id for message in messages))
+            state.message_count += self.counted(thread.id, messages)
+            # discord.py never updates a cached thread's message count, so it's as old as the last identify
+            fetched = await self.bot.fetch_channel(thread.id)
+            assert isinstance(fetched, discord.Thread)
+            if fetched.message_count != state.message_count:
+                logging.info(
+                    f"Expected {state.message_count} messages in {thread.name} but it has {fetched.message_count}, "
+                    f"reading all of it"
+                )
+                return len(messages) + await self.assign_history(thread)
+            await self.save_state(thread.id)
+            return len(messages)
+        finally:
+            self.syncing[thread.id] -= 1
+            if not self.syncing[thread.id]:
+                del self.syncing[thread.id]
+
+    async def assign_history(self, thread: discord.Thread) -> int:
+        """Reads a whole thread, dropping whatever is gone. Returns the number of messages"""
+        messages, valid = await self.read_pages(thread, after=None)
+        found_ids = {message.id for message in messages}
+        store = self.raw_chitter_store.setdefault(thread.id, {})
+        gone = [message_id for message_id in store if message_id not in found_ids]
+        for message_id in gone:
+            self.unstore_row(thread.id, message_id)
+        async with chitter_cursor(self.bot) as cur:
+            await cur.executemany(
+                """DELETE FROM chitter_rows WHERE table_id = ? AND message_id = ?;""",
+                [(thread.id, message_id) for message_id in gone]
+            )
         if thread.id in self.known_tables:
-            await self.known_tables[thread.id].synchronize(found_ids=message_ids)
-            
+            await self.known_tables[thread.id].apply(valid, complete=True)
+        self.thread_states[thread.id] = ThreadState(
+            max(found_ids, default=thread.id),
+            self.counted(thread.id, messages),
+            int(time.time()),
+        )
+        await self.save_state(thread.id)
+        return len(messages)
 
     async def assign_row(self, table_id: int, message: discord.Message):
-        row = self.parse_generic_row(message.content)
-        if row is None:
-            if table_id in self.known_tables and message.author.bot:
-                # A bot has sent an invalid row. Inform them of this, in case it's a bug
-                try:
-                    await message.add_reaction("\N{EXCLAMATION QUESTION MARK}\ufe0f")
-                except discord.HTTPException:
-                    pass
-            return 
-        
-        # Add the message to the default store
-        self.raw_chitter_store.setdefault(table_id, {})[message.id] = row
+        previous = self.raw_chitter_store.get(table_id, {}).get(message.id)
+        valid = await self.assign_rows(table_id, [message])
         if table_id in self.known_tables:
-            await self.known_tables[table_id].assign_row(message)
+            if valid:
+                await self.known_tables[table_id].assign_row(message)
+            else:
+                await self.known_tables[table_id].delete_row(message.id)
+            if previous is not None:
+                await self.restore_newest(table_id, previous)
+
+    async def restore_newest(self, table_id: int, row: ChitterRow):
+        """Upserts the newest row left with the same key as a row that changed or went away.
+
+        Only the newest row for a key is in a known table, so an older one has
+        to take over when that one is deleted or edited into something else.
+        """
+        known = self.known_tables[table_id]
+        column = known.key_column
+        if column is None or column >= row.width:
+            return
+        rows = self.query(table_id, column, row.value(self.bot, column))
+        for message_id, other in sorted(rows, key=lambda pair: pair[0], reverse=True):
+            if await known.assign_stored(message_id, other):
+                return
+
+    async def assign_rows(self, table_id: int, messages: list[discord.Message]) -> list[discord.Message]:
+        """Stores the valid rows among the messages, and returns them"""
+        store = self.raw_chitter_store.setdefault(table_id, {})
+        valid = []
+        invalidated = []
+        for message in messages:
+            row = parse_chitter_row(message.content)
+            if row is None:
+                if table_id in self.known_tables and message.author.bot:
+                    # A bot has sent an invalid row. Inform them of this, in case it's a bug
+                    self.report_invalid_row(message)
+                # it may have been edited into an invalid row
+                if message.id in store:
+                    self.unstore_row(table_id, message.id)
+                    invalidated.append((table_id, message.id))
+                continue
+            # Add the message to the default store
+            self.store_row(table_id, message.id, row)
+            valid.append(message)
+        if not valid and not invalidated:
+            return valid
+        async with chitter_cursor(self.bot) as cur:
+            await cur.executemany(
+                """INSERT OR REPLACE INTO chitter_rows VALUES (?, ?, ?);""",
+                [(table_id, message.id, message.content) for message in valid]
+            )
+            await cur.executemany(
+                """DELETE FROM chitter_rows WHERE table_id = ? AND message_id = ?;""",
+                invalidated
+            )
+        return valid
+
+    def report_invalid_row(self, message: discord.Message):
+        # catching up again shouldn't react to the same rows again
+        if any(reaction.me and str(reaction.emoji) == invalid_row_reaction for reaction in message.reactions):
+            return
+        self.invalid_rows.put_nowait(message)
+
+    def table_indexes(self, table_id: int) -> dict[int, ColumnIndex]:
+        indexes = self.indexes.get(table_id)
+        if indexes is None:
+            indexes = self.indexes[table_id] = {
+                column: ColumnIndex(column) for column in self.indexed_columns.get(table_id, [])
+            }
+        return indexes
+
+    def store_row(self, table_id: int, message_id: int, row: ChitterRow):
+        store = self.raw_chitter_store.setdefault(table_id, {})
+        indexes = self.table_indexes(table_id).values()
+        previous = store.get(message_id)
+        for index in indexes:
+            if previous is not None:
+                index.remove(message_id, previous)
+            index.add(message_id, row)
+        store[message_id] = row
+
+    def unstore_row(self, table_id: int, message_id: int) -> ChitterRow:
+        row = self.raw_chitter_store[table_id].pop(message_id)
+        for index in self.table_indexes(table_id).values():
+            index.remove(message_id, row)
+        return row
+
+    def query(self, table_id: int, column: int, value: AnyValue | discord.abc.Snowflake) -> list[tuple[int, ChitterRow]]:
+        """The rows with the value in the column, as (message id, row) pairs.
+
+        The column has to be indexed, see `indexed_columns`. Use
+        `ChitterRow.values` to get the discord objects in a row.
+        """
+        index = self.table_indexes(table_id).get(column)
+        if index is None:
+            raise ValueError(f"Column {column} of table {table_id} isn't indexed")
+        store = self.raw_chitter_store.get(table_id, {})
+        return [(message_id, store[message_id]) for message_id in index.get(value)]
 
     async def remove_row(self, table_id: int, message_id: int):
-        del self.raw_chitter_store[table_id][message_id]
+        row = self.unstore_row(table_id, message_id)
+        async with chitter_cursor(self.bot) as cur:
+            await cur.execute(
+                """DELETE FROM chitter_rows WHERE table_id = ? AND message_id = ?;""",
+                [table_id, message_id]
+            )
         if table_id in self.known_tables:
             await self.known_tables[table_id].delete_row(message_id)
+            await self.restore_newest(table_id, row)
 
-    @commands.Cog.listener()
+    @message_trigger(
+        check=lambda self, message: (
+            isinstance(message.channel, discord.Thread)
+            and message.channel.parent_id == self.bot.bot_chitter_id
+        ),
+    )
     async def on_message(self, message: discord.Message):
-        if not message.author.bot:
-            return
-        if not isinstance(message.channel, discord.Thread):
-            return
-        if message.channel.parent_id != self.bot.bot_chitter_id:
-            return
-        await self.assign_row(message.channel.id, message)
+        assert isinstance(message.channel, discord.Thread)
+        # only bots write rows, but everyone's messages are in the thread's message count
+        if message.author.bot:
+            await self.assign_row(message.channel.id, message)
+        state = self.thread_states.get(message.channel.id)
+        # a sync in progress reads and counts it, or leaves it for the next one
+        if state is not None and message.channel.id not in self.syncing:
+            state.last_message_id = max(state.last_message_id, message.id)
+            state.message_count += self.counted(message.channel.id, [message])
+            await self.save_state(message.channel.id)
 
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
@@ -345,6 +1062,10 @@ class BotChitter(Cog, ChitterBase):
 
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        state = self.thread_states.get(payload.channel_id)
+        if state is not None and payload.message_id != payload.channel_id:
+            state.message_count -= 1
+            await self.save_state(payload.channel_id)
         if payload.channel_id not in self.raw_chitter_store:
             return
         if payload.message_id not in self.raw_chitter_store[payload.channel_id]:
@@ -357,6 +1078,8 @@ class BotChitter(Cog, ChitterBase):
             return
         
         self.raw_chitter_store[thread.id] = {}
+        self.thread_states[thread.id] = ThreadState(thread.id, 0, int(time.time()))
+        await self.save_state(thread.id)
         # can't be in the known tables unless by an act of clairvoyance?
 
     @commands.Cog.listener()
@@ -369,13 +1092,13 @@ class BotChitter(Cog, ChitterBase):
         if thread.locked:
             if thread.id not in self.raw_chitter_store:
                 return
-            del self.raw_chitter_store[thread.id]
+            await self.forget_thread(thread.id)
             # TODO need for custom?
         else:
             if thread.id in self.raw_chitter_store:
                 return
             # TODO need for custom?
-            await self.assign_history(thread)
+            await self.sync_thread(thread)
 
     @commands.Cog.listener()
     async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
@@ -386,20 +1109,56 @@ class BotChitter(Cog, ChitterBase):
             return
         if thread.id not in self.raw_chitter_store:
             return
-        del self.raw_chitter_store[thread.id]
+        await self.forget_thread(thread.id)
         # TODO need for custom?
 
     @commands.is_owner()
     @commands.group(invoke_without_command=True)
     async def table(self, ctx: Context):
         '''Administrative commands for handling #bot-chitter tables'''
-        # TODO show information on followed & stored tables
+        lines = []
+        for table_id, store in sorted(self.raw_chitter_store.items(), key=lambda item: -len(item[1])):
+            thread = self.bot.get_channel(table_id)
+            name = thread.mention if isinstance(thread, discord.Thread) else f"`{table_id}`"
+            kind = "known" if table_id in self.known_tables else "own" if table_id in self.own_tables else "raw"
+            lines.append(f"{name} ({kind}): {len(store)} rows")
+            lines.extend(f"-# {index.describe()}" for index in self.table_indexes(table_id).values())
+        outbox = self.outbox
+        waiting = sum(map(len, outbox.queues.values()))
+        lines.append(
+            f"Outbox: {waiting} waiting, {outbox.coalesced} coalesced, "
+            f"{outbox.retried} retried, {outbox.failed} failed"
+        )
+        await ctx.send("\n".join(lines))
 
     @commands.is_owner()
     @table.command()
     async def refresh(self, ctx: Context, table: str):
-        '''Fetches all the data for the given table, accounting for any newly defined handlers'''
-        # TODO
+        '''Fetches all the data for the given table, accounting for any newly defined handlers
+
+        Parameters
+        -----------
+        table: str
+            The table's name, thread name or thread ID
+        '''
+        thread = self.find_table(table)
+        if thread is None:
+            return await ctx.send(f"I don't know a table called {table}")
+        async with ctx.typing():
+            count = await self.sync_thread(thread, force=True)
+        await ctx.send(f"Read all {count} messages in {thread.mention}")
+
+    def find_table(self, table: str) -> discord.Thread | None:
+        table_id = self.own_table_aliases.get(table)
+        if table_id is None and table.isdigit():
+            table_id = int(table)
+        if table_id is not None:
+            thread = self.bot.get_channel(table_id)
+            return thread if isinstance(thread, discord.Thread) else None
+        chitter = self.bot.get_channel(self.bot.bot_chitter_id)
+        if not isinstance(chitter, (discord.TextChannel, discord.ForumChannel)):
+            return None
+        return discord.utils.get(chitter.threads, name=table)
 
 async def setup(bot: OliviaBot):
     await bot.add_cog(BotChitter(bot))
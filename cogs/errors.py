@@ -1,5 +1,4 @@
 import logging
-import traceback
 
 import discord
 from discord.ext import commands
@@ -20,21 +19,6 @@ class ErrorHandler(Cog):
             commands.CheckFailure, # all things related to bad checks
             commands.UserInputError, # all things related to bad input
         )
-        if isinstance(original, skip_tb):
-            description = None
-        else:
-            tb = "\n".join(
-                traceback.format_exception(type(original), original, original.__traceback__)
-            )
-            description = f"```py\n{tb}\n```"
-        
-        embed = discord.Embed(
-            title=error,
-            description=(description or "")[:4096] or None,
-            color=discord.Color.from_str("#db7420"),
-            timestamp=ctx.message.created_at,
-        )
-
         author = f"Author: {ctx.author.mention} ({ctx.author}, ID: {ctx.author.id})"
         channel = (
             f"Channel: {ctx.channel.mention} ({ctx.channel}, ID: {ctx.channel.id})"
@@ -49,23 +33,18 @@ class ErrorHandler(Cog):
             if ctx.guild
             else "Private messages"
         )
-        context = "\n".join([author, channel, guild])
-        embed.add_field(name="Context", value=context, inline=False)
-
-        content = (
-            f"```\n{ctx.message.content[:1000]}\n```\nJump: {ctx.message.jump_url}"
-        )
-        embed.add_field(
-            name=(
-                "Message (truncated)" if len(ctx.message.content) > 1000 else "Message"
-            ),
-            value=content,
-            inline=False,
+        # the jump link goes first, so trimming the context only cuts the message
+        message = f"Jump: {ctx.message.jump_url}\n```\n{ctx.message.content[:300]}\n```"
+        context = "\n".join([author, channel, guild, message])
+
+        # identical errors get grouped into one embed, see LogShipper
+        self.bot.shipper.error(
+            original,
+            str(error) or type(original).__name__,
+            context,
+            include_traceback=not isinstance(original, skip_tb),
         )
 
-        webhook = discord.Webhook.from_url(self.bot.webhook_url, client=self.bot)
-        await webhook.send(embed=embed)
-
     @commands.Cog.listener()
     async def on_command_error(self, ctx: Context, error: commands.CommandError):
         # skip errors that we don't want to report in any way
@@ -3,65 +3,46 @@ from __future__ import annotations
 import asyncio
 import datetime
 import random
-import re
 
 import discord
 from discord.ext import commands
 
 from bot import Context, Cog
+from dispatch import message_trigger
 
 
 class Like(Cog):
-    pattern = re.compile(r"\blike$")
-
-    @commands.Cog.listener()
+    @message_trigger(
+        r"\blike$",
+        check=lambda self, message: message.author.id in self.bot.settings.likers,
+    )
     async def on_message(self, message: discord.Message):
-        if not self.pattern.search(message.content):
+        liker = self.bot.settings.likers.get(message.author.id)
+        if liker is None:
             return
-        active_after = await self.like_enabled_after(message.author.id)
         now = datetime.datetime.now()
-        if now > active_after:
-            async with self.bot.cursor() as cur:
-                await cur.execute(
-                    "SELECT enabled_in_cw FROM likers WHERE user_id = ?;",
-                    [message.author.id],
-                )
-                result = await cur.fetchone()
-                if result is not None:
-                    [enabled_in_cw] = result
-                    if (
-                        not enabled_in_cw
-                        and isinstance(message.channel, discord.Thread)
-                        and message.channel.parent
-                        and message.channel.parent.name == "cw"
-                    ):
-                        return
+        if now > datetime.datetime.fromtimestamp(liker.enabled_after):
+            if (
+                not liker.enabled_in_cw
+                and isinstance(message.channel, discord.Thread)
+                and message.channel.parent
+                and message.channel.parent.name == "cw"
+            ):
+                return
             await asyncio.sleep(random.random())
             await message.add_reaction("\N{THUMBS UP SIGN}")
 
-    async def like_enabled_after(self, user_id: int):
-        async with self.bot.cursor() as cur:
-            await cur.execute(
-                "SELECT enabled_after FROM likers WHERE user_id = ?;",
-                [user_id],
-            )
-            result = await cur.fetchone()
-        if not result:
+    def like_enabled_after(self, user_id: int):
+        liker = self.bot.settings.likers.get(user_id)
+        if liker is None:
             return datetime.datetime.max
-        return datetime.datetime.fromtimestamp(result[0])
+        return datetime.datetime.fromtimestamp(liker.enabled_after)
 
     async def set_like_enabled_after(self, user_id: int, dt: datetime.datetime):
-        async with self.bot.cursor() as cur:
-            await cur.execute(
-                """INSERT INTO likers(user_id, enabled_after) VALUES(?, ?)
-                ON CONFLICT(user_id) DO
-                UPDATE SET enabled_after=excluded.enabled_after;
-                """,
-                [user_id, dt.timestamp()],
-            )
+        await self.bot.settings.set_like_enabled_after(user_id, dt.timestamp())
 
     async def like_status(self, ctx: Context):
-        active_after = await self.like_enabled_after(ctx.author.id)
+        active_after = self.like_enabled_after(ctx.author.id)
         now = datetime.datetime.now()
         if active_after == datetime.datetime.max:
             status = "not enabled"
@@ -100,10 +81,7 @@ class Like(Cog):
     async def disable_like(self, ctx: Context):
         """Disable auto\N{THUMBS UP SIGN}ing"""
         status = await self.like_status(ctx)
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """DELETE FROM likers WHERE user_id = ?;""", [ctx.author.id]
-            )
+        await self.bot.settings.remove_liker(ctx.author.id)
         await ctx.message.add_reaction("\N{THUMBS UP SIGN}")
         await ctx.send(
             f"You have disabled auto\N{THUMBS UP SIGN}ing (previously {status})"
@@ -112,21 +90,16 @@ class Like(Cog):
     @like.group(name="cw", invoke_without_command=True)
     async def like_cw(self, ctx: Context):
         """Manage auto\N{THUMBS UP SIGN}ing in #cw"""
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """SELECT enabled_in_cw FROM likers WHERE user_id = ?;""", [ctx.author.id]
+        liker = self.bot.settings.likers.get(ctx.author.id)
+        if liker is None:
+            return await ctx.send(
+                "You currently don't have auto\N{THUMBS UP SIGN}ing enabled, see `+like` for more"
+            )
+        else:
+            action = "enabled" if liker.enabled_in_cw else "disables"
+            return await ctx.send(
+                f"Auto\N{THUMBS UP SIGN}ing for you is currently {action} in #cw"
             )
-            row = await cur.fetchone()
-            if row is None:
-                return await ctx.send(
-                    "You currently don't have auto\N{THUMBS UP SIGN}ing enabled, see `+like` for more"
-                )
-            else:
-                [enabled_in_cw] = row
-                action = "enabled" if enabled_in_cw else "disables"
-                return await ctx.send(
-                    f"Auto\N{THUMBS UP SIGN}ing for you is currently {action} in #cw"
-                )
 
 
     @like_cw.command(name="enable")
@@ -134,10 +107,7 @@ class Like(Cog):
         """Enable auto\N{THUMBS UP SIGN}ing in #cw"""
         if await self.like_status(ctx) == "not enabled":
             return await ctx.send("You don't have auto\N{THUMBS UP SIGN}ing enabled")
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """UPDATE likers SET enabled_in_cw = 1 WHERE user_id = ?;""", [ctx.author.id]
-            )
+        await self.bot.settings.set_like_enabled_in_cw(ctx.author.id, True)
         await ctx.message.add_reaction("\N{THUMBS UP SIGN}")
         await ctx.send("Enabled auto\N{THUMBS UP SIGN}ing in #cw")
 
@@ -146,10 +116,7 @@ class Like(Cog):
         """Disable auto\N{THUMBS UP SIGN}ing in #cw"""
         if await self.like_status(ctx) == "not enabled":
             return await ctx.send("You don't have auto\N{THUMBS UP SIGN}ing enabled")
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """UPDATE likers SET enabled_in_cw = 0 WHERE user_id = ?;""", [ctx.author.id]
-            )
+        await self.bot.settings.set_like_enabled_in_cw(ctx.author.id, False)
         await ctx.message.add_reaction("\N{THUMBS UP SIGN}")
         await ctx.send("Disabled auto\N{THUMBS UP SIGN}ing in #cw")
 
@@ -157,7 +124,7 @@ class Like(Cog):
     @like.command()
     async def chill(self, ctx: Context):
         """Chill out my auto\N{THUMBS UP SIGN}ing for a few hours B)"""
-        active_after = await self.like_enabled_after(ctx.author.id)
+        active_after = self.like_enabled_after(ctx.author.id)
         if active_after == datetime.datetime.max:
             return await ctx.send("I'm already chilling for you B)")
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import random
 
 import aiosqlite
@@ -7,18 +8,22 @@ import discord
 from discord.ext import commands
 
 from bot import Context, Cog
+from dispatch import message_trigger
 from qwd import louna_only
 
-from .horse import unhorsify
+from .horse import unhorsify, unpattern
 
 
 class Louna(Cog):
     async def cog_load(self):
-        await super().cog_load()
-        await self.reload_emoji()
+        await asyncio.gather(super().cog_load(), self.reload_emoji())
+
+    async def cog_unload(self):
+        await super().cog_unload()
+        await self.bot.writes.flush()
     
     async def reload_emoji(self):
-        async with self.bot.cursor() as cur:
+        async with self.bot.cursor(readonly=True) as cur:
             await cur.execute("""SELECT * FROM louna_emojis;""")
             rows = list(await cur.fetchall())
             self.louna_emojis: list[str] = [row[0] for row in rows]
@@ -38,15 +43,11 @@ class Louna(Cog):
         # - we need to determine whether oliviabot has sentience
         # - we also need to make sure she's happy
         await ctx.reply(f"l\u200bouna {choices}", mention_author=False)
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """UPDATE params SET louna_command_count = louna_command_count + 1;"""
-            )
-            await cur.execute(
-                """UPDATE params SET louna_emoji_count = louna_emoji_count + ?;""", [k]
-            )
+        self.bot.writes.increment("params", "louna_command_count")
+        self.bot.writes.increment("params", "louna_emoji_count", k)
 
-    @commands.Cog.listener(name="on_message")
+    # unhorsify can only change the content if there is some horse in it
+    @message_trigger(unpattern.pattern)
     async def hevonen(self, msg: discord.Message):
         before, after = msg.content, unhorsify(msg.content)
         # technically can break due to +lounaaaa but idc
@@ -56,16 +57,18 @@ class Louna(Cog):
             new_msg.content = after
             await self.bot.process_commands(new_msg)
 
-        # minecraft :)
-        # technically fails on proxied webhook users
-        if msg.channel.id == self.bot.allowed_webhook_channel_id and msg.author.bot:
-            ctx = await self.bot.get_context(msg)
-            await self.bot.invoke(ctx)
+    # minecraft :)
+    # technically fails on proxied webhook users
+    @message_trigger(bots=True, check=lambda self, msg: msg.channel.id == self.bot.allowed_webhook_channel_id)
+    async def minecraft(self, msg: discord.Message):
+        ctx = await self.bot.get_context(msg)
+        await self.bot.invoke(ctx)
 
     @louna.command()
     async def stats(self, ctx: Context):
         """how many l\u200bouna?"""
-        async with ctx.cursor() as cur:
+        await self.bot.writes.flush()
+        async with ctx.cursor(readonly=True) as cur:
             await cur.execute(
                 """SELECT louna_command_count, louna_emoji_count FROM params;"""
             )
@@ -112,7 +115,7 @@ class Louna(Cog):
         emoji: str
             The name of the emoji
         """
-        async with self.bot.cursor() as cur:
+        async with self.bot.cursor(readonly=True) as cur:
             await cur.execute(
                 """SELECT weight FROM louna_emojis WHERE emoji = ?;""",
                 [emoji]
@@ -1,13 +1,22 @@
 from __future__ import annotations
+import asyncio
 import re
 
 import discord
 from discord.ext import commands
 
 from bot import Context, Cog
+from dispatch import message_trigger
 
 class Mjau(Cog):
-    @commands.Cog.listener("on_message")
+    def mjau_pattern(self) -> str | None:
+        # a superset of the forms below, for the dispatcher to filter on
+        if not self.mjau_set:
+            return None
+        mjaus = "|".join(re.escape(mjau) for mjau in self.mjau_set)
+        return fr"\A\+(?:new|no)?(?:{mjaus})"
+
+    @message_trigger(mjau_pattern, rewrite=True)
     async def mjau_detector(self, msg: discord.Message):
         if msg.content.startswith("+"):
             for mjau in self.mjau_set:
@@ -32,8 +41,11 @@ class Mjau(Cog):
     async def mjau(self, ctx: Context):
         """:mjau: (twice)
         """
-        await ctx.send(f"<a:meow:1236434880238456933>")
-        await ctx.send(f"<a:meow:1236434880238456933>")
+        # queued back to back, in order
+        await asyncio.gather(
+            ctx.send(f"<a:meow:1236434880238456933>"),
+            ctx.send(f"<a:meow:1236434880238456933>"),
+        )
     
     @commands.command()
     async def mjaus(self, ctx: Context):
@@ -45,8 +57,10 @@ class Mjau(Cog):
         )
 
     async def cog_load(self):
-        await super().cog_load()
-        async with self.bot.cursor() as cur:
+        await asyncio.gather(super().cog_load(), self.load_mjaus())
+
+    async def load_mjaus(self):
+        async with self.bot.cursor(readonly=True) as cur:
             await cur.execute("""SELECT * FROM mjaus;""")
             results = [str(row[0]) for row in await cur.fetchall()]
             self.mjau_set = set(results)
@@ -65,6 +79,7 @@ class Mjau(Cog):
         async with ctx.cursor() as cur:
             await cur.execute("""INSERT INTO mjaus VALUES(?);""", [mjau])
             self.mjau_set.add(mjau)
+        self.bot.dispatcher.rebuild()
         await ctx.send(f"+{mjau} <a:meow:1236434880238456933>")
     
     @commands.command()
@@ -80,5 +95,6 @@ class Mjau(Cog):
         async with ctx.cursor() as cur:
             await cur.execute("""DELETE FROM mjaus WHERE mjau = ?;""", [mjau])
             self.mjau_set.remove(mjau)
+        self.bot.dispatcher.rebuild()
         await ctx.send(f"<:nomeow:1309094454904487966>")
     
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import csv
 import datetime
 import logging
@@ -157,6 +158,16 @@ def typed_neofetch_row(row: dict[str, str]) -> NeofetchEntry:
     }
 
 
+def read_neofetch_timestamp() -> int:
+    with open("data/neofetch_updated") as f:
+        return int(f.read())
+
+
+def read_neofetch_rows() -> list[NeofetchEntry]:
+    with open("data/neofetch.csv") as f:
+        return [typed_neofetch_row(row) for row in csv.DictReader(f)]
+
+
 class DistroNotFound(Exception):
     """Valid neofetch distro not found"""
 
@@ -168,17 +179,21 @@ class DistroNotFound(Exception):
 
 class Neofetch(Cog):
     async def cog_load(self):
-        await super().cog_load()
+        await asyncio.gather(super().cog_load(), self.load_neofetch())
+
+    async def load_neofetch(self):
         def regexp(pattern: str, string: str) -> bool:
             return re.match(pattern, string) is not None
 
-        await self.bot.db.create_function("regexp", 2, regexp, deterministic=True)
+        # this runs in Python once per row, so it gets its own timings
+        timed_regexp = self.bot.query_stats.timed_function("REGEXP", regexp)
+        await self.bot.create_function("regexp", 2, timed_regexp, deterministic=True)
         await self.init_neofetch()
 
     async def generate_neofetch(
         self, ctx: Context, distro: str | None = None, is_mobile: bool = False
     ):
-        async with ctx.cursor() as cur:
+        async with ctx.cursor(readonly=True) as cur:
             if is_mobile:
                 await cur.execute(
                     """SELECT distro, color_index, color_rgb, logo FROM neofetch
@@ -275,7 +290,7 @@ class Neofetch(Cog):
     async def distro_autocomplete(
         self, interaction: discord.Interaction, query: str
     ) -> list[discord.app_commands.Choice]:
-        async with self.bot.cursor() as cur:
+        async with self.bot.cursor(readonly=True) as cur:
             await cur.execute(
                 """SELECT DISTINCT distro FROM neofetch
                 WHERE instr(lower(distro), lower(:query))
@@ -309,37 +324,31 @@ class Neofetch(Cog):
                 ctx.error_handled = True
 
     async def init_neofetch(self):
+        # file and CSV work stays off the event loop
+        timestamp = await asyncio.to_thread(read_neofetch_timestamp)
+        self.neofetch_updated = datetime.datetime.fromtimestamp(
+            timestamp, datetime.UTC
+        )
         async with self.bot.cursor() as cur:
-            with open("data/neofetch_updated") as f:
-                timestamp = int(f.read())
-                self.neofetch_updated = datetime.datetime.fromtimestamp(
-                    timestamp, datetime.UTC
+            await cur.execute("""SELECT last_neofetch_update FROM params;""")
+            last_neofetch_update = await cur.fetchone()
+            if last_neofetch_update is None or last_neofetch_update[0] != timestamp:
+                rows = await asyncio.to_thread(read_neofetch_rows)
+                await cur.executemany(
+                    """INSERT INTO neofetch VALUES (
+                        :distro, :suffix, :pattern, :mobile_width, :color_index, :color_rgb, :logo
+                    );
+                    """,
+                    rows,
                 )
-                await cur.execute("""SELECT last_neofetch_update FROM params;""")
-                last_neofetch_update = await cur.fetchone()
-                if last_neofetch_update is None or last_neofetch_update[0] != timestamp:
-                    with open("data/neofetch.csv") as f:
-                        rows = [typed_neofetch_row(row) for row in csv.DictReader(f)]
-                        await cur.executemany(
-                            """INSERT INTO neofetch VALUES (
-                                :distro, :suffix, :pattern, :mobile_width, :color_index, :color_rgb, :logo
-                            );
-                            """,
-                            rows,
-                        )
-                if last_neofetch_update is None:
-                    await cur.execute(
-                        """INSERT INTO params(last_neofetch_update) VALUES(?);""",
-                        [timestamp],
-                    )
-                else:
-                    await cur.execute(
-                        """UPDATE params SET last_neofetch_update = ?;""", [timestamp]
-                    )
-
-            with open("data/neofetch_updated") as f:
-                self.neofetch_updated = datetime.datetime.fromtimestamp(
-                    int(f.read()), datetime.UTC
+            if last_neofetch_update is None:
+                await cur.execute(
+                    """INSERT INTO params(last_neofetch_update) VALUES(?);""",
+                    [timestamp],
+                )
+            else:
+                await cur.execute(
+                    """UPDATE params SET last_neofetch_update = ?;""", [timestamp]
                 )
 
         logging.info("Initialized neofetch data")
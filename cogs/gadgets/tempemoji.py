@@ -11,6 +11,7 @@ from discord.ext import commands, tasks
 from PIL import Image
 
 from bot import Context, Cog
+from shipping import Priority
 
 class EmojiNameConverter(commands.Converter):
     async def convert(self, ctx: commands.Context, argument: str):
@@ -33,6 +34,7 @@ class TempEmoji(Cog):
     async def cog_unload(self):
         await super().cog_unload()
         self.deleter_task.stop()
+        await self.bot.writes.flush()
 
     @commands.guild_only()
     # fixme: When discord fixes their shit, change this!
@@ -96,11 +98,10 @@ class TempEmoji(Cog):
         now = datetime.datetime.now()
         then = now + datetime.timedelta(hours=hours)
 
-        async with ctx.bot.cursor() as cur:
-            await cur.execute(
-                """INSERT INTO tempemoji VALUES(?, ?, ?);""",
-                [emoji.id, guild.id, then.timestamp()]
-            )
+        self.bot.writes.write(
+            """INSERT INTO tempemoji VALUES(?, ?, ?);""",
+            [emoji.id, guild.id, then.timestamp()]
+        )
 
         pronoun = random.choice(pronouns) if pronouns else "it"
         await ctx.message.add_reaction(emoji)
@@ -146,18 +147,18 @@ class TempEmoji(Cog):
             return
         guild = self.bot.get_guild(guild_id)
         guild_display = guild.name if guild else str(guild_id)
-        await self.bot.webhook.send(f"Deleting emoji <:__:{emoji_id}> in `{guild_display}`")
         try:
             await emoji.delete()
-            return await self.bot.webhook.send(f"Deleted!")
+            self.bot.shipper.log(f"Deleted emoji <:__:{emoji_id}> in `{guild_display}`", Priority.LOW)
         except discord.HTTPException:
             # nothing to do really, either we can't delete or it's already gone
-            return await self.bot.webhook.send(f"Failed!")
+            self.bot.shipper.log(f"Failed to delete emoji <:__:{emoji_id}> in `{guild_display}`", Priority.LOW)
 
     @tasks.loop(minutes=15)
     async def deleter_task(self):
         await asyncio.sleep(60)
         now = datetime.datetime.now()
+        await self.bot.writes.flush()
         async with self.bot.cursor() as cur:
             await cur.execute(
                 """SELECT emoji_id, guild_id FROM tempemoji WHERE delete_at < ?;""",
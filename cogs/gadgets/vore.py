@@ -13,6 +13,10 @@ from qwd import qwd_only
 
 
 class Vore(Cog):
+    async def cog_unload(self):
+        await super().cog_unload()
+        await self.bot.writes.flush()
+
     def extract_vore_from_row(self, row: aiosqlite.Row) -> tuple[str, str]:
         timestamp: int
         channel_id: int
@@ -28,7 +32,8 @@ class Vore(Cog):
         return timestring, jump
 
     async def recent_vore(self):
-        async with self.bot.cursor() as cur:
+        await self.bot.writes.flush()
+        async with self.bot.cursor(readonly=True) as cur:
             await cur.execute("""SELECT * FROM vore ORDER BY timestamp DESC LIMIT 1;""")
             result = await cur.fetchone()
             if not result:
@@ -50,15 +55,14 @@ class Vore(Cog):
     async def zero(self, ctx: Context):
         """Damn it, they did it again"""
         recent = await self.recent_vore()
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """INSERT INTO vore VALUES(?, ?, ?);""",
-                [
-                    int(ctx.message.created_at.timestamp()),
-                    ctx.channel.id,
-                    ctx.message.id,
-                ],
-            )
+        self.bot.writes.write(
+            """INSERT INTO vore VALUES(?, ?, ?);""",
+            [
+                int(ctx.message.created_at.timestamp()),
+                ctx.channel.id,
+                ctx.message.id,
+            ],
+        )
         if recent is None:
             return await ctx.send("It had never been mentioned before... before you...")
         await ctx.send("Yum! " + recent)
@@ -67,7 +71,8 @@ class Vore(Cog):
     @vore.command()
     async def random(self, ctx: Context):
         """Show a random instance"""
-        async with ctx.cursor() as cur:
+        await self.bot.writes.flush()
+        async with ctx.cursor(readonly=True) as cur:
             await cur.execute("""SELECT * FROM vore;""")
             result = list(await cur.fetchall())
         if not result:
@@ -83,6 +88,7 @@ class Vore(Cog):
         
         Removes the most recent instance
         """
+        await self.bot.writes.flush()
         async with ctx.cursor() as cur:
             await cur.execute("""DELETE FROM vore ORDER BY timestamp DESC LIMIT 1;""")
             result = list(await cur.fetchall())
@@ -117,7 +123,8 @@ class Vore(Cog):
             else:
                 return await ctx.send("Then no")
 
-        async with ctx.cursor() as cur:
+        await self.bot.writes.flush()
+        async with ctx.cursor(readonly=True) as cur:
             await cur.execute(
                 """SELECT timestamp FROM vore ORDER BY timestamp ASC LIMIT 1;"""
             )
@@ -132,6 +139,7 @@ class Vore(Cog):
         qwd = self.bot.get_guild(self.bot.qwd_id)
         assert qwd
         results: list[tuple[int, int, int]] = []
+        progress = await ctx.send("0 instances found so far")
         for channel in qwd.channels:
             if not isinstance(channel, discord.abc.Messageable):
                 continue
@@ -153,10 +161,10 @@ class Vore(Cog):
                         message_id = msg.id
                         results.append((timestamp, channel_id, message_id))
 
-                        if len(results) % 10 == 0:
-                            await ctx.send(
-                                f"{len(results)} instances found so far, updating database"
-                            )
+                        # edits that pile up behind a rate limit collapse into the latest one
+                        ctx.edit_progress(
+                            progress, content=f"{len(results)} instances found so far"
+                        )
             except discord.Forbidden:
                 # no permission to read channel history
                 continue
@@ -7,8 +7,9 @@ from .info import Info
 from .marbles import Marbles
 from .ticker import Ticker
 from .proxy import Proxy
+from .stats import Stats
 
-class Meta(Alias, Admin, Info, Marbles, Ticker, Proxy):
+class Meta(Alias, Admin, Info, Marbles, Ticker, Proxy, Stats):
     """Commands related to the behavior of the bot itself"""
     def __init__(self, bot: OliviaBot):
         self.bot = bot
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import sqlite3
 
 import discord
 from discord.ext import commands
 
 from bot import Context, Cog
+from metrics import ms
 from qwd import QwdieConverter, AnyUser
 
 class HelpCommand(commands.DefaultHelpCommand):
@@ -23,6 +25,7 @@ class Admin(Cog):
         self.bot.help_command.cog = self
     
     async def cog_unload(self):
+        await super().cog_unload()
         self.bot.help_command = self.original_help
 
     @commands.command()
@@ -35,10 +38,18 @@ class Admin(Cog):
     
     @commands.command()
     @commands.is_owner()
-    async def sync(self, ctx: Context):
-        """Sync application commands"""
-        await self.bot.tree.sync()
-        await ctx.ack()
+    async def sync(self, ctx: Context, force: bool = False):
+        """Sync application commands
+        
+        Parameters
+        -----------
+        force: bool
+            Whether to sync even if nothing has changed
+        """
+        if await self.bot.sync_tree(force=force):
+            await ctx.ack()
+        else:
+            await ctx.ack("Nothing has changed since the last sync")
 
     @commands.command(aliases=['strql'])
     @commands.is_owner()
@@ -50,12 +61,62 @@ class Admin(Cog):
         command: str
             The SQL query to execute
         """
-        async with ctx.cursor() as cur:
-            await cur.execute(command)
-            return await ctx.send(
-                "\n".join(["".join([str(item) for item in row]) if ctx.invoked_with == "strql" else str(row) for row in await cur.fetchall()])[:2000]
-                or "<no result>"
+        # whether it writes can't be told from the first keyword (WITH ... DELETE), but SQLite knows
+        try:
+            async with ctx.cursor(readonly=True) as cur:
+                await cur.execute(command)
+                rows = await cur.fetchall()
+        except sqlite3.OperationalError as error:
+            if error.sqlite_errorcode & 0xff != sqlite3.SQLITE_READONLY:
+                raise
+            async with ctx.cursor() as cur:
+                await cur.execute(command)
+                rows = await cur.fetchall()
+        return await ctx.send(
+            "\n".join(["".join([str(item) for item in row]) if ctx.invoked_with == "strql" else str(row) for row in rows])[:2000]
+            or "<no result>"
+        )
+
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def sqlstats(self, ctx: Context, limit: int = 10):
+        """Show the SQL statements that took the most time recently
+
+        Parameters
+        -----------
+        limit: int
+            How many statements to show
+        """
+        stats = self.bot.query_stats
+        lines = []
+        for sql, statement, wall in stats.top(limit):
+            queue = statement.queue()
+            [(site, _)] = statement.sites.most_common(1)
+            lines.append(
+                f"`{ms(wall.total)}` in {wall.count} calls (p50 {ms(wall.percentile(0.5))}, "
+                f"p99 {ms(wall.percentile(0.99))}, {ms(queue.mean)} queued on average, {statement.rows} rows)\n"
+                f"-# {site}: `{sql[:200]}`"
+            )
+        for name, function in stats.functions.items():
+            histogram = function.histogram
+            lines.append(
+                f"`{ms(histogram.total)}` in {histogram.count} calls to {name}() "
+                f"(p99 {ms(histogram.percentile(0.99))})"
             )
+        await ctx.send("\n".join(lines) or "No queries recorded yet")
+
+    @sqlstats.command(name="threshold")
+    @commands.is_owner()
+    async def sqlstats_threshold(self, ctx: Context, milliseconds: float):
+        """Set how slow a query must be to get logged
+
+        Parameters
+        -----------
+        milliseconds: float
+            The new threshold
+        """
+        self.bot.query_stats.slow_threshold = milliseconds / 1000
+        await ctx.ack(f"Logging queries slower than {milliseconds}ms")
 
     @commands.command()
     @commands.is_owner()
@@ -67,6 +128,7 @@ class Admin(Cog):
         user: discord.User
             The user to oliviafy
         '''
+        await self.bot.settings.set_auto_olivia(user.id, True)
         self.bot.owner_ids.add(user.id)
         await ctx.ack(f"{user.mention} hi, olivia")
 
@@ -82,5 +144,6 @@ class Admin(Cog):
         '''
         if user.id == 156021301654454272:
             return await ctx.send("what no I'm not doing that")
+        await self.bot.settings.set_auto_olivia(user.id, False)
         self.bot.owner_ids.remove(user.id)
         await ctx.send(f"{user.mention} bye bye... it was nice knowing you as olivia")
@@ -4,7 +4,7 @@ from __future__ import annotations
 import discord
 from discord.ext import commands
 
-from bot import Context, Cog
+from bot import Context, Cog, alias_key
 from qwd import QwdieConverter, AnyUser
 
 class Alias(Cog):
@@ -26,12 +26,14 @@ class Alias(Cog):
     async def alias_addition(self, ctx: Context, alias: str, user: AnyUser, extra: bool = False):
         if alias in self.bot.inv_person_aliases.get(ctx.author.id, []):
             return await ctx.send("already got that one!")
-        message_id = await self.bot.chitter_send("aliases", user, alias)
         async with self.bot.cursor() as cur:
             await cur.execute(
-                """INSERT INTO person_aliases VALUES(?, ?, ?);""",
-                [alias, user.id, message_id]
+                """INSERT INTO person_aliases VALUES(?, ?, NULL);""",
+                [alias, user.id]
             )
+        self.bot.add_alias(alias, user.id)
+        # sent in the background, and the message id is filled in by OliviaBot.on_chitter_sent
+        await self.bot.chitter_send("aliases", alias_key(user.id, alias), user, alias)
         msg = f"{user.mention} hi {alias} :)"
         if extra:
             msg += "\n-# consider `+alias add` next time"
@@ -39,7 +41,6 @@ class Alias(Cog):
             msg,
             allowed_mentions=discord.AllowedMentions.none()
         )
-        await self.bot.refresh_aliases()
 
     async def alias_deletion(self, ctx: Context, alias: str, user: AnyUser):
         if alias not in self.bot.inv_person_aliases.get(ctx.author.id, []):
@@ -57,14 +58,16 @@ class Alias(Cog):
                 """DELETE FROM person_aliases WHERE alias = ? AND id = ?;""",
                 [alias, user.id]
             )
+            deleted = cur.rowcount > 0
+        if deleted:
+            self.bot.remove_alias(alias, user.id)
         await ctx.send(
             f"{alias} no more :)",
             allowed_mentions=discord.AllowedMentions.none()
         )
-        if isinstance(message_id, int):
-            await self.bot.chitter_delete("aliases", message_id)
-        await self.bot.refresh_aliases()
-        # await self.bot.chitter_delete("aliases", )
+        if deleted:
+            # if it hasn't been sent yet, it never will be
+            await self.bot.chitter_delete("aliases", alias_key(user.id, alias), message_id)
 
     @alias.command(name="add", aliases=["new"])
     async def add_alias(self, ctx: Context, alias: str):
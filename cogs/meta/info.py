@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import inspect
 from pathlib import Path
 import textwrap
@@ -12,8 +13,7 @@ from bot import Context, Cog
 
 class Info(Cog):
     async def cog_load(self):
-        await super().cog_load()
-        self.repo = git.Repo(".")
+        self.repo, _ = await asyncio.gather(asyncio.to_thread(git.Repo, "."), super().cog_load())
 
     @commands.command()
     async def about(self, ctx: Context):
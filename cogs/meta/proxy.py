@@ -3,6 +3,7 @@ from __future__ import annotations
 from discord.ext import commands
 
 from bot import Context, Cog
+from metrics import ms
 
 class Proxy(Cog):
     @commands.group(invoke_without_command=True)
@@ -11,7 +12,7 @@ class Proxy(Cog):
 
         See your current proxy settings.
         """
-        negation = "" if await self.bot.is_proxied(ctx.author) else " not"
+        negation = "" if self.bot.is_proxied(ctx.author) else " not"
         await ctx.send(
             f"You have{negation} enabled proxy mode. "
             "You can enable or disable it using `+proxy enable` or `+proxy disable`."
@@ -20,11 +21,8 @@ class Proxy(Cog):
     @proxy.command(name="enable", aliases=["on", "optin"])
     async def proxy_enable(self, ctx: Context):
         """Enable proxy mode"""
-        negation = "" if await self.bot.is_proxied(ctx.author) else " not"
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """INSERT OR IGNORE INTO proxiers VALUES(?);""", [ctx.author.id]
-            )
+        negation = "" if self.bot.is_proxied(ctx.author) else " not"
+        await self.bot.settings.set_proxied(ctx.author.id, True)
         await ctx.send(
             f"You have enabled proxy mode (previously{negation} enabled)"
         )
@@ -32,11 +30,19 @@ class Proxy(Cog):
     @proxy.command(name="disable", aliases=["off", "optout"])
     async def proxy_disable(self, ctx: Context):
         """Disable proxy mode"""
-        negation = "" if await self.bot.is_proxied(ctx.author) else " not"
-        async with ctx.cursor() as cur:
-            await cur.execute(
-                """DELETE FROM proxiers WHERE user_id = ?;""", [ctx.author.id]
-            )
+        negation = "" if self.bot.is_proxied(ctx.author) else " not"
+        await self.bot.settings.set_proxied(ctx.author.id, False)
         await ctx.send(
             f"You have disabled proxy mode (previously{negation} enabled)"
         )
+
+    @proxy.command(name="stats")
+    async def proxy_stats(self, ctx: Context):
+        """See how often proxied messages get matched"""
+        proxies = self.bot.proxies
+        latency = proxies.latency
+        await ctx.send(
+            f"Matched {proxies.matched} proxied messages and gave up on {proxies.expired} "
+            f"({proxies.match_rate:.0%} match rate), and let {proxies.immediate} through immediately. "
+            f"Waiting for a match took {ms(latency.mean)} on average (p99 {ms(latency.percentile(0.99))})."
+        )
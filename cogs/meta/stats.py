@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from aiohttp import web
+from discord.ext import commands
+
+import config
+from bot import Context, Cog
+from metrics import ms
+
+class Stats(Cog):
+    async def cog_load(self):
+        await asyncio.gather(super().cog_load(), self.start_exporter())
+
+    async def cog_unload(self):
+        await super().cog_unload()
+        if self.exporter is not None:
+            await self.exporter.cleanup()
+
+    async def start_exporter(self):
+        """Serves the command metrics to Prometheus, on localhost only"""
+        port = getattr(config, "metrics_port", 9464)
+        app = web.Application()
+        app.router.add_get("/metrics", self.serve_metrics)
+        self.exporter: web.AppRunner | None = web.AppRunner(app, access_log=None)
+        await self.exporter.setup()
+        try:
+            await web.TCPSite(self.exporter, "127.0.0.1", port).start()
+        except OSError as e:
+            logging.warning(f"Couldn't serve metrics on port {port}: {e}")
+            await self.exporter.cleanup()
+            self.exporter = None
+
+    async def serve_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.bot.command_metrics.prometheus(), content_type="text/plain")
+
+    # mixins share one namespace, so these need unique names
+    @commands.Cog.listener("on_command")
+    async def stats_on_command(self, ctx: Context):
+        assert ctx.command
+        timings = self.bot.command_metrics[ctx.command.qualified_name]
+        timings.started.observe(time.perf_counter() - ctx.received_at)
+
+    @commands.Cog.listener("on_command_completion")
+    async def stats_on_command_completion(self, ctx: Context):
+        self.record_finish(ctx, error=False)
+
+    @commands.Cog.listener("on_command_error")
+    async def stats_on_command_error(self, ctx: Context, error: commands.CommandError):
+        if ctx.command is not None:
+            self.record_finish(ctx, error=True)
+
+    def record_finish(self, ctx: Context, *, error: bool):
+        assert ctx.command
+        timings = self.bot.command_metrics[ctx.command.qualified_name]
+        timings.finished.observe(time.perf_counter() - ctx.received_at)
+        timings.converters.observe(ctx.converter_time)
+        timings.errors += error
+
+    @commands.command()
+    @commands.is_owner()
+    async def stats(self, ctx: Context, *, command: str | None = None):
+        """Show how long commands take
+
+        Parameters
+        -----------
+        command: str | None
+            The command to show, or all of them
+        """
+        shown = self.bot.command_metrics.commands
+        if command is not None:
+            shown = {command: shown[command]} if command in shown else {}
+        lines = []
+        for name, timings in sorted(shown.items(), key=lambda item: -item[1].finished.total):
+            finished = timings.finished
+            lines.append(
+                f"`+{name}`: {finished.count} runs, {timings.errors} errors, "
+                f"p50 {ms(finished.percentile(0.5))}, p99 {ms(finished.percentile(0.99))} "
+                f"(starting after {ms(timings.started.mean)}, {ms(timings.converters.mean)} converting on average)"
+            )
+        await ctx.send("\n".join(lines) or "No commands recorded yet")
+
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def lag(self, ctx: Context):
+        """Show how late the event loop has been running"""
+        monitor = self.bot.loop_monitor
+        lag = monitor.lag
+        await ctx.send(
+            f"Event loop lag over {lag.count} heartbeats: "
+            f"p50 {ms(lag.percentile(0.5))}, p90 {ms(lag.percentile(0.9))}, "
+            f"p99 {ms(lag.percentile(0.99))}, max {ms(lag.max)}. "
+            f"{monitor.stalls} stalls over {ms(monitor.threshold)}."
+        )
+
+    @lag.command(name="threshold")
+    @commands.is_owner()
+    async def lag_threshold(self, ctx: Context, milliseconds: float):
+        """Set how long a stall must be to get reported
+
+        Parameters
+        -----------
+        milliseconds: float
+            The new threshold
+        """
+        self.bot.loop_monitor.threshold = milliseconds / 1000
+        await ctx.ack(f"Reporting stalls longer than {milliseconds}ms")
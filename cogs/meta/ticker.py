@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import datetime
 
 import discord
@@ -8,20 +9,23 @@ from bot import Context, Cog
 
 class Ticker(Cog):
     async def cog_load(self):
-        await super().cog_load()
         self.tickers: dict[str, dict[int, datetime.datetime]] = {}
         self.snapshot: str = ""
-        async with self.bot.cursor() as cur:
+        await asyncio.gather(super().cog_load(), self.load_tickers())
+        self.ticker_cleanup.start()
+
+    async def load_tickers(self):
+        async with self.bot.cursor(readonly=True) as cur:
             await cur.execute("""SELECT * FROM ticker_hashes;""")
             results = list(await cur.fetchall())
             for command, hash, del_ts in results:
                 self.tickers.setdefault(command, {})[hash] = datetime.datetime.fromtimestamp(del_ts, datetime.UTC)
-        self.ticker_cleanup.start()
 
     async def cog_unload(self):
         await super().cog_unload()
         self.tickers = {}
         self.ticker_cleanup.stop()
+        await self.bot.writes.flush()
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx: Context):
@@ -39,11 +43,11 @@ class Ticker(Cog):
         ))
         delete_at = timestamp + datetime.timedelta(days=30)
         self.tickers.setdefault(qualname, {})[mishmash] = delete_at
-        async with self.bot.cursor() as cur:
-            await cur.execute(
-                """INSERT OR REPLACE INTO ticker_hashes VALUES(?, ?, ?);""",
-                [qualname, mishmash, delete_at.timestamp()]
-            )
+        self.bot.writes.write(
+            """INSERT OR REPLACE INTO ticker_hashes VALUES(?, ?, ?);""",
+            [qualname, mishmash, delete_at.timestamp()],
+            key=("ticker_hashes", qualname, mishmash),
+        )
     
     @tasks.loop(time=datetime.time(hour=0, minute=0))
     async def ticker_cleanup(self):
@@ -56,6 +60,7 @@ class Ticker(Cog):
             if not self.tickers[cmd]:
                 del self.tickers[cmd]
 
+        await self.bot.writes.flush()
         async with self.bot.cursor() as cur:
             await cur.execute(
                 """DELETE FROM ticker_hashes WHERE delete_at < ?;""",
@@ -32,7 +32,7 @@ class Reloader(Cog):
             results = ", ".join(
                 f"{action}ed `{extension}`" for action, extension in changes
             )
-            await self.bot.webhook.send(f"Updated extensions: {results}")
+            self.bot.shipper.log(f"Updated extensions: {results}")
 
 
 async def setup(bot: OliviaBot):
@@ -2,7 +2,6 @@ import asyncio
 import logging
 from typing import Any
 
-from discord.ext import commands
 import discord
 import aioconsole
 import discord.http
@@ -10,6 +9,7 @@ import parse_discord
 import parse_discord.formatting
 
 from bot import Context, OliviaBot, Cog
+from dispatch import message_trigger
 
 
 def sgr(*ns: int) -> str:
@@ -263,11 +263,8 @@ class Terminal(Cog):
                     self.bot.terminal_cog_interrupted = True
                 raise
 
-    @commands.Cog.listener()
+    @message_trigger(check=lambda self, message: message.author.id == self.bot.tester_bot_id)
     async def on_message(self, message: discord.Message):
-        if message.author.id != self.bot.tester_bot_id:
-            return
-
         ctx = await self.bot.get_context(message, cls=TestContext)
         await self.bot.invoke(ctx)
 
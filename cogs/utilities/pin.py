@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import random
 
 import discord
@@ -35,9 +36,12 @@ class Pin(Cog):
         await msg.pin(reason=f"+pin by {ctx.author}")
         pins = ["📌", "📍", "🧷", "🎳"]
         pin = random.choice(pins)
-        result = await ctx.send(f"{pin} {msg.jump_url} (<loading> / 50 pins)")
-        all_pins = len(await msg.channel.pins())
-        await result.edit(content=f"{pin} {msg.jump_url} ({all_pins} / 50 pins)")
+        # the pin count is fetched while the reply is being sent
+        result, all_pins = await asyncio.gather(
+            ctx.send(f"{pin} {msg.jump_url} (<loading> / 50 pins)"),
+            msg.channel.pins(),
+        )
+        await ctx.edit_progress(result, content=f"{pin} {msg.jump_url} ({len(all_pins)} / 50 pins)")
 
     @pin.error
     async def pin_error(self, ctx: Context, error: commands.CommandError):
@@ -12,4 +12,9 @@ louna_id: int
 real_olivia_id: int
 allowed_webhook_channel_id: int
 chitter_database_path: str
-bot_chitter_id: int
\ No newline at end of file
+bot_chitter_id: int
+# optional, defaults to 9464
+metrics_port: int
+# optional, how many bot-chitter threads to catch up on at once, defaults to 4
+chitter_concurrency: int
+
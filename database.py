@@ -0,0 +1,441 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import itertools
+import logging
+from pathlib import Path
+import re
+import sqlite3
+import sys
+import threading
+import time
+from types import CodeType
+from typing import TYPE_CHECKING, Any, AsyncContextManager, AsyncIterator, Callable, Hashable, Sequence
+
+import aiosqlite
+from discord.ext import tasks
+
+from metrics import Histogram, ms
+
+if TYPE_CHECKING:
+    from bot import OliviaBot
+
+# How long a writer waits for the other one to let go of the write lock, in milliseconds
+busy_timeout = 30_000
+
+@asynccontextmanager
+async def connect_writer(path: str) -> AsyncIterator[aiosqlite.Connection]:
+    """Opens a writer connection, switching the database to WAL mode.
+
+    There are two writers: the main connection, and the one `WriteBuffer`
+    flushes on so that no other write ends up inside its transaction. SQLite
+    still allows one write at a time, so each waits up to `busy_timeout` for
+    the other instead of failing with "database is locked". In WAL mode readers
+    on other connections never block on the writers (or vice versa), and
+    `synchronous = NORMAL` only syncs at checkpoints instead of on every commit.
+    """
+    async with aiosqlite.connect(path, isolation_level=None) as db:
+        await db.execute("PRAGMA journal_mode = WAL;")
+        await db.execute("PRAGMA synchronous = NORMAL;")
+        await db.execute(f"PRAGMA busy_timeout = {busy_timeout};")
+        yield db
+
+class ReadPool:
+    """A small pool of read-only connections to a WAL-mode database.
+
+    Every aiosqlite connection runs its queries on its own worker thread, so
+    reads through the pool run in parallel with each other and with the writers.
+    """
+    def __init__(self, path: str, *, size: int = 4) -> None:
+        self.uri = Path(path).resolve().as_uri() + "?mode=ro"
+        self.size = size
+        self.connections: list[aiosqlite.Connection] = []
+        self.idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+
+    async def __aenter__(self) -> ReadPool:
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.uri, uri=True, isolation_level=None)
+            self.connections.append(conn)
+            self.idle.put_nowait(conn)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        for conn in self.connections:
+            await conn.close()
+        self.connections = []
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        conn = await self.idle.get()
+        try:
+            yield conn
+        finally:
+            self.idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def cursor(self) -> AsyncIterator[aiosqlite.Cursor]:
+        async with self.connection() as conn:
+            async with conn.cursor() as cur:
+                yield cur
+
+    async def create_function(self, *args: Any, **kwargs: Any) -> None:
+        for conn in self.connections:
+            await conn.create_function(*args, **kwargs)
+
+class WriteBuffer:
+    """Write-behind buffer for hot counter and log writes.
+
+    Counter increments are summed in memory, and rows queued under the same key
+    replace each other. Everything is flushed in a single transaction on a
+    connection of its own once `max_pending` writes are queued, every
+    `interval` seconds, and on shutdown. Rows that fail are dropped and
+    reported; only a busy database puts them back in the queue.
+
+    Anything that reads a buffered table should `flush()` first.
+    """
+    def __init__(self, bot: OliviaBot, db: aiosqlite.Connection, *, max_pending: int = 64, interval: float = 10.0) -> None:
+        self.bot = bot
+        self.db = db
+        self.max_pending = max_pending
+        self.counters: dict[tuple[str, str], float] = {}
+        self.rows: dict[Hashable, tuple[str, Sequence[Any]]] = {}
+        self.unique_keys = itertools.count()
+        self.lock = asyncio.Lock()
+        self.flush_task: asyncio.Task[None] | None = None
+        # statistics
+        self.pending = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flusher.change_interval(seconds=interval)
+
+    def start(self) -> None:
+        self.flusher.start()
+
+    def stop(self) -> None:
+        self.flusher.cancel()
+
+    @tasks.loop(seconds=10.0)
+    async def flusher(self):
+        await self.flush()
+
+    def increment(self, table: str, column: str, amount: float = 1) -> None:
+        """Adds `amount` to a counter column of a single-row table such as `params`."""
+        key = (table, column)
+        if key in self.counters:
+            self.coalesced += 1
+        self.counters[key] = self.counters.get(key, 0) + amount
+        self.submitted_one()
+
+    def write(self, sql: str, parameters: Sequence[Any], *, key: Hashable | None = None) -> None:
+        """Queues a write. A later write with the same `key` replaces this one,
+        so only use a key for idempotent statements like `INSERT OR REPLACE`.
+        """
+        if key is None:
+            key = next(self.unique_keys)
+        elif key in self.rows:
+            self.coalesced += 1
+        self.rows[key] = (sql, parameters)
+        self.submitted_one()
+
+    def submitted_one(self) -> None:
+        self.submitted += 1
+        self.pending += 1
+        if self.pending >= self.max_pending and (self.flush_task is None or self.flush_task.done()):
+            self.flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        async with self.lock:
+            if not self.counters and not self.rows:
+                return
+            counters, self.counters = self.counters, {}
+            rows, self.rows = self.rows, {}
+            pending, self.pending = self.pending, 0
+
+            # group identical statements so each becomes one executemany
+            statements: dict[str, list[Sequence[Any]]] = {}
+            for (table, column), amount in counters.items():
+                statements.setdefault(
+                    f"UPDATE {table} SET {column} = {column} + ?;", []
+                ).append([amount])
+            for sql, parameters in rows.values():
+                statements.setdefault(sql, []).append(parameters)
+
+            dropped = 0
+            # on a connection of its own, so no other write can end up in this transaction
+            async with instrumented(self.db.cursor(), self.bot.query_stats, "WriteBuffer.flush") as cur:
+                try:
+                    await cur.execute("BEGIN IMMEDIATE;")
+                    for sql, parameter_list in statements.items():
+                        dropped += await self.write_statement(cur, sql, parameter_list)
+                    await cur.execute("COMMIT;")
+                except sqlite3.Error as error:
+                    if self.db.in_transaction:
+                        await cur.execute("ROLLBACK;")
+                    if not retryable(error):
+                        logging.exception(f"Failed to flush buffered writes, dropping {pending} of them")
+                        return
+                    logging.warning(f"Failed to flush buffered writes ({error}), requeueing them")
+                    for key, amount in counters.items():
+                        self.counters[key] = self.counters.get(key, 0) + amount
+                    self.rows = rows | self.rows
+                    self.pending += pending
+                    return
+
+            self.flushes += 1
+            written = sum(len(parameter_list) for parameter_list in statements.values()) - dropped
+            logging.info(
+                f"Flushed {pending} buffered writes as {written} rows in one transaction "
+                f"({dropped} dropped, {self.coalesced} coalesced in total)"
+            )
+
+    async def write_statement(self, cur: InstrumentedCursor, sql: str, parameter_list: list[Sequence[Any]]) -> int:
+        """Runs one statement for all its rows, dropping the rows that fail. Returns how many were dropped
+
+        A row that breaks a constraint would only fail again, and take every
+        other buffered write down with it each time, so it's reported instead.
+        """
+        await cur.execute("SAVEPOINT buffered_statement;")
+        try:
+            await cur.executemany(sql, parameter_list)
+        except sqlite3.Error as error:
+            await cur.execute("ROLLBACK TO buffered_statement;")
+            if retryable(error):
+                raise
+            # find out which of them it was
+            dropped = 0
+            for parameters in parameter_list:
+                await cur.execute("SAVEPOINT buffered_row;")
+                try:
+                    await cur.execute(sql, parameters)
+                except sqlite3.Error as error:
+                    await cur.execute("ROLLBACK TO buffered_row;")
+                    if retryable(error):
+                        raise
+                    dropped += 1
+                    logging.error(f"Dropped a buffered write ({error}): {sql} {parameters!r}")
+                    self.bot.shipper.error(error, "Dropped a buffered write", f"`{sql}` with `{parameters!r}`"[:300])
+                await cur.execute("RELEASE buffered_row;")
+            await cur.execute("RELEASE buffered_statement;")
+            return dropped
+        await cur.execute("RELEASE buffered_statement;")
+        return 0
+
+def retryable(error: sqlite3.Error) -> bool:
+    # a busy or locked database clears up by itself, unlike a broken constraint
+    code = getattr(error, "sqlite_errorcode", None)
+    return code is not None and code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+# The qualified name of the command being invoked, set by OliviaBot.invoke
+current_command: ContextVar[str | None] = ContextVar("current_command", default=None)
+
+# Functions that only pass a cursor along, and so never count as the call site
+cursor_forwarders: set[CodeType] = set()
+
+def call_site() -> str:
+    """The qualified name of the function asking for a cursor, e.g. `Like.on_message`"""
+    frame = sys._getframe(2)
+    while frame.f_back is not None and frame.f_code in cursor_forwarders:
+        frame = frame.f_back
+    return frame.f_code.co_qualname
+
+def normalize_sql(sql: str) -> str:
+    """Collapses literals and whitespace so that equivalent statements share a key"""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b-?\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?, ...)", sql)
+    return " ".join(sql.split()).rstrip(";")
+
+class StatementStats:
+    """Rolling statistics for one normalized statement.
+
+    Samples land in the newest of `windows` histograms, each covering
+    `window` seconds, so old traffic ages out without any bookkeeping.
+    """
+    def __init__(self, windows: int, window: float) -> None:
+        self.window = window
+        self.histograms: deque[tuple[int, Histogram, Histogram]] = deque(maxlen=windows)
+        self.rows = 0
+        self.sites: Counter[str] = Counter()
+
+    def current(self) -> tuple[Histogram, Histogram]:
+        index = int(time.monotonic() // self.window)
+        if not self.histograms or self.histograms[-1][0] != index:
+            self.histograms.append((index, Histogram(), Histogram()))
+        _, wall, queue = self.histograms[-1]
+        return wall, queue
+
+    def wall(self) -> Histogram:
+        return Histogram.merged(wall for _, wall, _ in self.histograms)
+
+    def queue(self) -> Histogram:
+        return Histogram.merged(queue for _, _, queue in self.histograms)
+
+class FunctionStats:
+    """Statistics for a Python function called from inside SQLite, once per row"""
+    def __init__(self) -> None:
+        self.histogram = Histogram()
+        self.lock = threading.Lock()
+
+    def wrap(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        def timed(*args: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                # these run on the aiosqlite worker threads, possibly several at once
+                with self.lock:
+                    self.histogram.observe(time.perf_counter() - start)
+        return timed
+
+class QueryStats:
+    """Per-statement timings for every query issued through OliviaBot.cursor()"""
+    def __init__(
+        self,
+        *,
+        slow_threshold: float = 0.1,
+        on_slow: Callable[[str, float, float, str, str | None], None] | None = None,
+        max_statements: int = 256,
+        windows: int = 6,
+        window: float = 600.0,
+    ) -> None:
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+        self.max_statements = max_statements
+        self.windows = windows
+        self.window = window
+        self.statements: OrderedDict[str, StatementStats] = OrderedDict()
+        self.functions: dict[str, FunctionStats] = {}
+
+    def record(self, sql: str, wall: float, queue: float, rows: int, site: str, command: str | None) -> None:
+        key = normalize_sql(sql)
+        stats = self.statements.get(key)
+        if stats is None:
+            stats = self.statements[key] = StatementStats(self.windows, self.window)
+            if len(self.statements) > self.max_statements:
+                self.statements.popitem(last=False)
+        else:
+            self.statements.move_to_end(key)
+        wall_histogram, queue_histogram = stats.current()
+        wall_histogram.observe(wall)
+        queue_histogram.observe(queue)
+        stats.rows += rows
+        stats.sites[site if command is None else f"{site} (+{command})"] += 1
+        if wall >= self.slow_threshold and self.on_slow is not None:
+            self.on_slow(key, wall, queue, site, command)
+
+    def timed_function(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Wraps a user function registered with `create_function` so its calls are timed"""
+        stats = self.functions.setdefault(name, FunctionStats())
+        return stats.wrap(fn)
+
+    def top(self, n: int) -> list[tuple[str, StatementStats, Histogram]]:
+        walls = [(key, stats, stats.wall()) for key, stats in self.statements.items()]
+        walls.sort(key=lambda item: item[2].total, reverse=True)
+        return walls[:n]
+
+class InstrumentedCursor:
+    """Wraps an aiosqlite cursor, timing every statement on its way through the worker thread.
+
+    The wall time of a statement covers its execute() and any fetches after it,
+    since SQLite only steps through most of a SELECT while rows are fetched.
+    The queue time is how long the call waited for the worker thread to pick it up.
+    """
+    def __init__(self, cursor: aiosqlite.Cursor, stats: QueryStats, site: str, command: str | None) -> None:
+        self.cursor = cursor
+        self.stats = stats
+        self.site = site
+        self.command = command
+        self.sql: str | None = None
+        self.wall = 0.0
+        self.queue = 0.0
+        self.rows = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        started: list[float] = []
+
+        def timed(*args: Any) -> Any:
+            started.append(time.perf_counter())
+            return fn(*args)
+
+        submitted = time.perf_counter()
+        try:
+            # Note: uses aiosqlite internals, as there's no public hook into the worker thread
+            return await self.cursor._execute(timed, *args)
+        finally:
+            self.wall += time.perf_counter() - submitted
+            if started:
+                self.queue += started[0] - submitted
+
+    async def start(self, sql: str, fn: Callable[..., Any], *args: Any) -> InstrumentedCursor:
+        self.finish()
+        self.sql = sql
+        await self.run(fn, *args)
+        self.rows = max(self.cursor.rowcount, 0)
+        return self
+
+    def finish(self) -> None:
+        if self.sql is not None:
+            self.stats.record(self.sql, self.wall, self.queue, self.rows, self.site, self.command)
+        self.sql = None
+        self.wall = self.queue = 0.0
+        self.rows = 0
+
+    async def execute(self, sql: str, parameters: Any = None) -> InstrumentedCursor:
+        return await self.start(sql, self.cursor._cursor.execute, sql, [] if parameters is None else parameters)
+
+    async def executemany(self, sql: str, parameters: Any) -> InstrumentedCursor:
+        return await self.start(sql, self.cursor._cursor.executemany, sql, parameters)
+
+    async def executescript(self, sql_script: str) -> InstrumentedCursor:
+        return await self.start(sql_script, self.cursor._cursor.executescript, sql_script)
+
+    async def fetchone(self) -> Any:
+        row = await self.run(self.cursor._cursor.fetchone)
+        self.rows += row is not None
+        return row
+
+    async def fetchmany(self, size: int | None = None) -> list[Any]:
+        args = () if size is None else (size,)
+        rows = await self.run(self.cursor._cursor.fetchmany, *args)
+        self.rows += len(rows)
+        return rows
+
+    async def fetchall(self) -> list[Any]:
+        rows = await self.run(self.cursor._cursor.fetchall)
+        self.rows += len(rows)
+        return rows
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self.rows_iterator()
+
+    async def rows_iterator(self) -> AsyncIterator[Any]:
+        while rows := await self.fetchmany(self.cursor.arraysize):
+            for row in rows:
+                yield row
+
+    @property
+    def rowcount(self) -> int:
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self) -> int | None:
+        return self.cursor.lastrowid
+
+    @property
+    def description(self) -> Any:
+        return self.cursor.description
+
+@asynccontextmanager
+async def instrumented(
+    cursor: AsyncContextManager[aiosqlite.Cursor], stats: QueryStats, site: str
+) -> AsyncIterator[InstrumentedCursor]:
+    async with cursor as cur:
+        wrapped = InstrumentedCursor(cur, stats, site, current_command.get())
+        try:
+            yield wrapped
+        finally:
+            wrapped.finish()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import re
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, TypeVar
+
+import discord
+
+if TYPE_CHECKING:
+    from bot import OliviaBot
+
+Listener = Callable[[Any, discord.Message], Coroutine[Any, Any, Any]]
+L = TypeVar("L", bound=Listener)
+
+@dataclass(frozen=True)
+class MessageTrigger:
+    pattern: str | Callable[[Any], str | None] | None
+    bots: bool | None
+    check: Callable[[Any, discord.Message], bool] | None
+    rewrite: bool
+
+def message_trigger(
+    pattern: str | Callable[[Any], str | None] | None = None,
+    *,
+    bots: bool | None = None,
+    check: Callable[[Any, discord.Message], bool] | None = None,
+    rewrite: bool = False,
+) -> Callable[[L], L]:
+    """Registers a cog method as a message listener, see `MessageDispatcher`.
+
+    Parameters
+    -----------
+    pattern: str | Callable[[Cog], str | None] | None
+        A regex that must match somewhere in the content, or a function of the cog
+        returning one (or None to disable the listener). It is read again whenever
+        the dispatcher is rebuilt. It mustn't contain named groups.
+        Without a pattern, any content goes.
+    bots: bool | None
+        Whether the author must (or mustn't) be a bot. Either is fine by default.
+    check: Callable[[Cog, discord.Message], bool] | None
+        Any further cheap test, run only after the rest have passed.
+    rewrite: bool
+        Rewriters may change the message content in place. They run in order,
+        to completion, before commands and other listeners see the message.
+    """
+    def decorator(fn: L) -> L:
+        fn.__message_trigger__ = MessageTrigger(pattern, bots, check, rewrite)  # pyright: ignore[reportFunctionMemberAccess]
+        return fn
+    return decorator
+
+@dataclass(frozen=True)
+class BoundTrigger:
+    cog: Any
+    callback: Listener
+    trigger: MessageTrigger
+    # name of the group in the combined pattern, if any
+    group: str | None
+
+class MessageDispatcher:
+    """Routes every message to the `message_trigger` listeners that want it.
+
+    All trigger patterns are combined into one regex of optional lookaheads, so
+    a single scan over the content finds every trigger that matches. Author and
+    custom checks are only run for those. The regex is rebuilt whenever a cog is
+    added or removed, or when a cog's pattern changes (see `rebuild`).
+    """
+    def __init__(self, bot: OliviaBot) -> None:
+        self.bot = bot
+        self.rewriters: list[BoundTrigger] = []
+        self.listeners: list[BoundTrigger] = []
+        self.combined: re.Pattern[str] | None = None
+        # listeners still running; the event loop only keeps weak references to tasks
+        self.tasks: set[asyncio.Task[None]] = set()
+
+    def rebuild(self) -> None:
+        rewriters: list[BoundTrigger] = []
+        listeners: list[BoundTrigger] = []
+        patterns: dict[str, str] = {}
+        for cog in self.bot.cogs.values():
+            found: dict[str, tuple[Listener, MessageTrigger]] = {}
+            # mixins make up most cogs, so look through every base
+            for base in reversed(type(cog).__mro__):
+                for name, value in vars(base).items():
+                    trigger = getattr(value, "__message_trigger__", None)
+                    if isinstance(trigger, MessageTrigger):
+                        found[name] = value, trigger
+                    elif name in found:
+                        del found[name]
+            for callback, trigger in found.values():
+                pattern = trigger.pattern(cog) if callable(trigger.pattern) else trigger.pattern
+                group = None
+                if pattern is not None:
+                    group = f"trigger{len(patterns)}"
+                    patterns[group] = pattern
+                elif callable(trigger.pattern):
+                    continue
+                bound = BoundTrigger(cog, callback, trigger, group)
+                (rewriters if trigger.rewrite else listeners).append(bound)
+
+        if patterns:
+            # stop only where at least one pattern matches, then see which ones do
+            any_match = "(?=" + "|".join(f"(?:{pattern})" for pattern in patterns.values()) + ")"
+            each = "".join(f"(?=(?P<{group}>{pattern}))?" for group, pattern in patterns.items())
+            self.combined = re.compile(any_match + each)
+        else:
+            self.combined = None
+        self.rewriters = rewriters
+        self.listeners = listeners
+
+    def classify(self, content: str) -> set[str]:
+        """The groups of every trigger pattern matching the content"""
+        matched: set[str] = set()
+        if self.combined is not None:
+            for match in self.combined.finditer(content):
+                matched.update(group for group, value in match.groupdict().items() if value is not None)
+        return matched
+
+    @staticmethod
+    def wants(bound: BoundTrigger, message: discord.Message, matched: set[str]) -> bool:
+        trigger = bound.trigger
+        if trigger.bots is not None and message.author.bot != trigger.bots:
+            return False
+        if bound.group is not None and bound.group not in matched:
+            return False
+        return trigger.check is None or trigger.check(bound.cog, message)
+
+    async def run(self, bound: BoundTrigger, message: discord.Message) -> None:
+        try:
+            await bound.callback(bound.cog, message)
+        except Exception:
+            try:
+                await self.bot.on_error(f"on_message ({bound.callback.__qualname__})", message)
+            except Exception:
+                pass
+
+    async def dispatch(self, message: discord.Message) -> None:
+        content = message.content
+        matched = self.classify(content)
+        for bound in self.rewriters:
+            if self.wants(bound, message, matched):
+                await self.run(bound, message)
+                if message.content != content:
+                    content = message.content
+                    matched = self.classify(content)
+
+        for bound in self.listeners:
+            if self.wants(bound, message, matched):
+                task = asyncio.create_task(self.run(bound, message))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        await self.bot.process_commands(message)
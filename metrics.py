@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+from typing import Any, Awaitable, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+class Histogram:
+    """Fixed-size latency histogram, in seconds.
+
+    Buckets double from 0.1ms up to ~105s, so memory use stays constant
+    no matter how many samples are observed.
+    """
+    bounds: tuple[float, ...] = tuple(0.0001 * 2 ** i for i in range(21))
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        # the last bucket is +Inf
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: Histogram) -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @classmethod
+    def merged(cls, histograms: Iterable[Histogram]) -> Histogram:
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+    def percentile(self, q: float) -> float:
+        """The upper bound of the bucket containing the `q`-th quantile (0 <= q <= 1)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def prometheus(self, name: str, labels: dict[str, str]) -> list[str]:
+        """The histogram in the Prometheus text exposition format"""
+        label = ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items())
+        lines = []
+        seen = 0
+        for bound, n in zip((*self.bounds, float("inf")), self.counts):
+            seen += n
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{name}_bucket{{{label},le="{le}"}} {seen}')
+        lines.append(f"{name}_sum{{{label}}} {self.total}")
+        lines.append(f"{name}_count{{{label}}} {self.count}")
+        return lines
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}ms"
+
+class PhaseTimer:
+    """Wall-clock timings of named phases, which may overlap"""
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        # name -> (offset from start, duration)
+        self.phases: dict[str, tuple[float, float]] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (start - self.started, time.perf_counter() - start)
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        with self.phase(name):
+            return await awaitable
+
+    def mark(self, name: str) -> None:
+        """Records an instant, measured from the start"""
+        self.phases[name] = (0.0, time.perf_counter() - self.started)
+
+    def report(self) -> str:
+        """One line per phase, in the order they finished"""
+        width = max(map(len, self.phases), default=0)
+        return "\n".join(
+            f"{name:<{width}} {ms(duration):>10} (from +{ms(offset)})"
+            for name, (offset, duration) in sorted(self.phases.items(), key=lambda item: sum(item[1]))
+        )
+
+class CommandTimings:
+    """Latencies of one command, all measured from when its message was received"""
+    __slots__ = ("started", "finished", "converters", "errors")
+
+    def __init__(self) -> None:
+        # until on_command
+        self.started = Histogram()
+        # until on_command_completion or on_command_error
+        self.finished = Histogram()
+        # spent in checks and argument converters
+        self.converters = Histogram()
+        self.errors = 0
+
+class CommandMetrics:
+    """Per-command timings, keyed by qualified name like the ticker.
+
+    Memory use is bounded by the number of commands, not by uptime.
+    """
+    def __init__(self) -> None:
+        self.commands: dict[str, CommandTimings] = {}
+
+    def __getitem__(self, command: str) -> CommandTimings:
+        timings = self.commands.get(command)
+        if timings is None:
+            timings = self.commands[command] = CommandTimings()
+        return timings
+
+    def prometheus(self) -> str:
+        lines = []
+        for metric, help in [
+            ("started", "Time from receiving a message to starting its command"),
+            ("finished", "Time from receiving a message to finishing its command"),
+            ("converters", "Time spent in checks and converting command arguments"),
+        ]:
+            name = f"oliviabot_command_{metric}_seconds"
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} histogram")
+            for command, timings in sorted(self.commands.items()):
+                lines.extend(getattr(timings, metric).prometheus(name, {"command": command}))
+        name = "oliviabot_command_errors_total"
+        lines.append(f"# HELP {name} Commands that raised an error")
+        lines.append(f"# TYPE {name} counter")
+        for command, timings in sorted(self.commands.items()):
+            lines.append(f'{name}{{command="{escape_label(command)}"}} {timings.errors}')
+        return "\n".join(lines) + "\n"
+
+def describe_stack(frame: FrameType) -> str:
+    """Formats a stack, along with the innermost cog code found in it.
+
+    Only code locations are read, never locals: the loop thread keeps running
+    while this looks at its frames from another thread.
+    """
+    cog = None
+    current: FrameType | None = frame
+    while current is not None and cog is None:
+        code = current.f_code
+        if f"{os.sep}cogs{os.sep}" in code.co_filename:
+            cog = f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{current.f_lineno})"
+        current = current.f_back
+    stack = traceback.extract_stack(frame)
+    # skip the event loop machinery above the callback that is running
+    starts = [i for i, entry in enumerate(stack) if entry.filename == asyncio.events.__file__]
+    if starts:
+        stack = traceback.StackSummary.from_list(stack[starts[-1] + 1:])
+    return f"in cog code: {cog}\n{''.join(stack.format())}"
+
+class LoopMonitor:
+    """Measures how late the event loop wakes up a heartbeat, and finds out why.
+
+    By the time the heartbeat notices a stall, whatever caused it has already
+    returned. So a watchdog thread also watches the heartbeat, and when it is
+    overdue by `threshold` grabs the stack of the loop thread right then, along
+    with the command the blocked task was `running`.
+    """
+    def __init__(
+        self,
+        on_stall: Callable[[float, str], object],
+        *,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+    ) -> None:
+        self.on_stall = on_stall
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = Histogram()
+        self.stalls = 0
+        self.last_beat = time.monotonic()
+        # written by the watchdog, taken by the heartbeat
+        self.captured: str | None = None
+        self.lock = threading.Lock()
+        # the command each task is invoking, and since when; read by the watchdog
+        self.commands: dict[asyncio.Task[Any], tuple[str, float]] = {}
+        self.stopped = threading.Event()
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        self.task = asyncio.create_task(self.heartbeat())
+        threading.Thread(target=self.watchdog, name="loop watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+
+    @contextlib.contextmanager
+    def running(self, command: str | None) -> Iterator[None]:
+        """Marks the current task as running `command` while the block runs"""
+        task = asyncio.current_task()
+        if command is None or task is None:
+            yield
+            return
+        # a command can invoke another one in the same task
+        outer = self.commands.get(task)
+        self.commands[task] = (command, time.monotonic())
+        try:
+            yield
+        finally:
+            if outer is None:
+                del self.commands[task]
+            else:
+                self.commands[task] = outer
+
+    def describe_command(self) -> str:
+        # only single dict lookups, which are safe from the watchdog thread
+        task = asyncio.current_task(self.loop)
+        entry = self.commands.get(task) if task is not None else None
+        if entry is None:
+            return "outside any command"
+        command, started = entry
+        return f"in command {command} (started {ms(time.monotonic() - started)} ago)"
+
+    async def heartbeat(self) -> None:
+        while True:
+            start = time.monotonic()
+            self.last_beat = start
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - start - self.interval, 0.0)
+            self.lag.observe(lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                with self.lock:
+                    captured, self.captured = self.captured, None
+                self.on_stall(lag, captured or "(the stall ended before a stack could be captured)")
+
+    def watchdog(self) -> None:
+        reported = None
+        while not self.stopped.wait(self.interval):
+            beat = self.last_beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue < self.threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            report = f"{self.describe_command()}, {describe_stack(frame)}"
+            logging.warning(f"Event loop blocked for over {ms(overdue)} so far, {report}")
+            with self.lock:
+                self.captured = report
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Awaitable, Callable
+
+import aiosqlite
+
+Migration = Callable[[aiosqlite.Cursor], Awaitable[None]]
+
+# Migration N is the N-th entry of its list, and `PRAGMA user_version` records the
+# last one applied. Only ever append to these lists!
+main_migrations: list[Migration] = []
+chitter_migrations: list[Migration] = []
+
+def migration(migrations: list[Migration]) -> Callable[[Migration], Migration]:
+    def decorator(fn: Migration) -> Migration:
+        migrations.append(fn)
+        return fn
+    return decorator
+
+async def migrate(db: aiosqlite.Connection, migrations: list[Migration], name: str) -> None:
+    """Applies every migration newer than the database's schema version.
+
+    Each migration runs exactly once, in its own transaction together with the
+    version bump, so a failure leaves the database at the previous version.
+    """
+    async with db.execute("PRAGMA user_version;") as cur:
+        [[version]] = list(await cur.fetchall())
+    if version == len(migrations):
+        logging.info(f"The {name} database is up to date (schema version {version})")
+        return
+    if version > len(migrations):
+        raise RuntimeError(
+            f"The {name} database has schema version {version}, "
+            f"but I only know about {len(migrations)} migrations"
+        )
+
+    for number, fn in enumerate(migrations[version:], version + 1):
+        start = time.perf_counter()
+        async with db.cursor() as cur:
+            await cur.execute("BEGIN;")
+            try:
+                await fn(cur)
+                await cur.execute(f"PRAGMA user_version = {number};")
+                await cur.execute("COMMIT;")
+            except Exception:
+                await cur.execute("ROLLBACK;")
+                raise
+        elapsed = (time.perf_counter() - start) * 1000
+        logging.info(f"Applied {name} migration {number} ({fn.__name__}) in {elapsed:.1f}ms")
+
+async def has_column(cur: aiosqlite.Cursor, table: str, column: str) -> bool:
+    await cur.execute(f"PRAGMA table_info({table});")
+    return any(row[1] == column for row in await cur.fetchall())
+
+async def add_column(cur: aiosqlite.Cursor, table: str, column: str, definition: str) -> None:
+    if not await has_column(cur, table, column):
+        await cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+
+@migration(main_migrations)
+async def baseline(cur: aiosqlite.Cursor) -> None:
+    """Brings both fresh databases and ones from before versioning to the same schema."""
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS params(
+            last_neofetch_update INTEGER NOT NULL
+        );
+        """
+    )
+    await add_column(cur, "params", "louna_command_count", "INTEGER DEFAULT 0")
+    await add_column(cur, "params", "louna_emoji_count", "INTEGER DEFAULT 0")
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS neofetch(
+            distro TEXT NOT NULL,
+            suffix TEXT NOT NULL,
+            pattern TEXT NOT NULL,
+            mobile_width INTEGER NOT NULL,
+            color_index INTEGER NOT NULL,
+            color_rgb TEXT NOT NULL,
+            logo TEXT NOT NULL
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS vore(
+            timestamp INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS proxiers(
+            user_id INTEGER PRIMARY KEY
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS likers(
+            user_id INTEGER PRIMARY KEY,
+            enabled_after REAL NOT NULL
+        );
+        """
+    )
+    await add_column(cur, "likers", "enabled_in_cw", "INTEGER DEFAULT 0")
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS auto_olivias(
+            user_id INTEGER PRIMARY KEY
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS tempemoji(
+            emoji_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            delete_at REAL NOT NULL
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS louna_emojis(
+            emoji TEXT PRIMARY KEY,
+            weight REAL NOT NULL DEFAULT 0
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS person_aliases(
+            alias TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            PRIMARY KEY(alias, id)
+        );
+        """
+    )
+    # the oldest databases only have `alias` as the primary key
+    await cur.execute("""PRAGMA table_info(person_aliases);""")
+    primary_key = {row[1] for row in await cur.fetchall() if row[5]}
+    if primary_key == {"alias"}:
+        await cur.execute(
+            """CREATE TABLE new_person_aliases(
+                alias TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                PRIMARY KEY(alias, id)
+            );
+            """
+        )
+        await cur.execute("""INSERT INTO new_person_aliases SELECT alias, id FROM person_aliases;""")
+        await cur.execute("""DROP TABLE person_aliases;""")
+        await cur.execute("""ALTER TABLE new_person_aliases RENAME TO person_aliases;""")
+    await add_column(cur, "person_aliases", "chitter_message_id", "INTEGER DEFAULT NULL")
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS ticker_hashes(
+            command TEXT NOT NULL,
+            hash INTEGER NOT NULL,
+            delete_at REAL NOT NULL,
+            PRIMARY KEY(command, hash)
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS user_stacks(
+            user_id INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            value TEXT NOT NULL,
+            type TEXT NOT NULL,
+            PRIMARY KEY(user_id, idx)
+        );
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS mjaus(
+            mjau TEXT PRIMARY KEY
+        );
+        """
+    )
+
+@migration(main_migrations)
+async def tree_fingerprints(cur: aiosqlite.Cursor) -> None:
+    """Remembers the last synced application command tree, see `OliviaBot.sync_tree`."""
+    await add_column(cur, "params", "global_tree_fingerprint", "TEXT DEFAULT NULL")
+    await add_column(cur, "params", "guild_tree_fingerprint", "TEXT DEFAULT NULL")
+
+@migration(chitter_migrations)
+async def chitter_store(cur: aiosqlite.Cursor) -> None:
+    """Keeps the raw bot-chitter rows between runs, and how far each thread has been read."""
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS chitter_rows(
+            table_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            PRIMARY KEY(table_id, message_id)
+        ) WITHOUT ROWID;
+        """
+    )
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS chitter_threads(
+            table_id INTEGER PRIMARY KEY,
+            last_message_id INTEGER NOT NULL,
+            message_count INTEGER NOT NULL
+        );
+        """
+    )
+
+@migration(chitter_migrations)
+async def chitter_outbox(cur: aiosqlite.Cursor) -> None:
+    """Rows waiting to be sent, edited or deleted in our own bot-chitter tables, see `ChitterOutbox`."""
+    await cur.execute(
+        """CREATE TABLE IF NOT EXISTS chitter_outbox(
+            id INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            action TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            message_id INTEGER,
+            content TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0
+        );
+        """
+    )
+
+@migration(chitter_migrations)
+async def chitter_full_reads(cur: aiosqlite.Cursor) -> None:
+    """When each thread was last read in full, to reread it once that's too long ago."""
+    await add_column(cur, "chitter_threads", "full_read_at", "INTEGER NOT NULL DEFAULT 0")
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+import logging
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# Discord's limit on message content
+message_limit = 2000
+
+def split_message(content: str, limit: int = message_limit) -> list[str]:
+    """Splits content into messages under the limit, at line breaks where possible"""
+    chunks = []
+    while len(content) > limit:
+        cut = content.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            chunks.append(content[:limit])
+            content = content[limit:]
+        else:
+            chunks.append(content[:cut])
+            content = content[cut + 1:]
+    chunks.append(content)
+    return chunks
+
+def log_failure(future: asyncio.Future[Any]) -> None:
+    """Done callback for calls that nobody may be waiting on"""
+    if not future.cancelled() and future.exception() is not None:
+        logging.error("Outbound call failed", exc_info=future.exception())
+
+@dataclass
+class Bucket:
+    """Our side of one of Discord's rate limit buckets: `limit` calls every `per` seconds"""
+    limit: int
+    per: float
+    calls: deque[float] = field(default_factory=deque)
+
+    def expire(self, now: float) -> None:
+        while self.calls and self.calls[0] + self.per <= now:
+            self.calls.popleft()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.expire(loop.time())
+        if len(self.calls) >= self.limit:
+            await asyncio.sleep(self.calls[0] + self.per - loop.time())
+            self.expire(loop.time())
+        self.calls.append(loop.time())
+
+# Discord's per-channel limits for each route, as documented and observed
+route_limits = {
+    "messages": (5, 5.0),
+    "edits": (5, 5.0),
+    "reactions": (1, 0.25),
+}
+
+@dataclass(eq=False)
+class Operation:
+    run: Callable[[], Awaitable[Any]]
+    key: Hashable | None
+    futures: list[asyncio.Future[Any]]
+
+class Outbound:
+    """Outgoing API calls, queued per channel and per kind of call.
+
+    Discord rate-limits sending, editing and reacting in separate buckets for
+    each channel, so every (channel, route) pair gets its own lane. A lane runs
+    its calls one at a time and in order, while separate lanes run concurrently.
+    Each lane paces itself by its route's bucket in `route_limits`, so calls
+    wait here, where later ones can still be coalesced, instead of in a 429
+    retry; discord.py's own limiter remains as the fallback. A call submitted
+    with a `key` replaces any call with the same key still waiting in its lane,
+    such as an older progress edit to the same message.
+    """
+    def __init__(self) -> None:
+        self.lanes: dict[tuple[int, str], deque[Operation]] = {}
+        self.buckets: dict[tuple[int, str], Bucket] = {}
+        # the event loop only keeps weak references to tasks
+        self.drains: set[asyncio.Task[None]] = set()
+        self.coalesced = 0
+
+    def submit(
+        self,
+        channel_id: int,
+        route: str,
+        run: Callable[[], Awaitable[T]],
+        *,
+        key: Hashable | None = None,
+    ) -> asyncio.Future[T]:
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        lane_key = (channel_id, route)
+        lane = self.lanes.get(lane_key)
+        if lane is None:
+            lane = self.lanes[lane_key] = deque()
+            task = asyncio.create_task(self.drain(lane_key, lane))
+            self.drains.add(task)
+            task.add_done_callback(self.drains.discard)
+        elif key is not None:
+            for operation in lane:
+                if operation.key == key:
+                    operation.run = run
+                    operation.futures.append(future)
+                    self.coalesced += 1
+                    return future
+        lane.append(Operation(run, key, [future]))
+        return future
+
+    async def drain(self, lane_key: tuple[int, str], lane: deque[Operation]) -> None:
+        bucket = self.buckets.get(lane_key)
+        if bucket is None and lane_key[1] in route_limits:
+            bucket = self.buckets[lane_key] = Bucket(*route_limits[lane_key[1]])
+        while lane:
+            if bucket is not None:
+                await bucket.acquire()
+            # taken off the lane first, so nothing coalesces into a call already in flight
+            operation = lane.popleft()
+            try:
+                result = await operation.run()
+            except Exception as e:
+                for future in operation.futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in operation.futures:
+                    if not future.done():
+                        future.set_result(result)
+        del self.lanes[lane_key]
+        if bucket is not None:
+            bucket.expire(asyncio.get_running_loop().time())
+            # a bucket with calls in it still has to hold back the next lane
+            if not bucket.calls:
+                del self.buckets[lane_key]
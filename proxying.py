@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import re
+from typing import Callable, Iterable
+
+import discord
+
+from metrics import Histogram
+
+word = re.compile(r"\w*")
+
+@dataclass(eq=False)
+class PendingProxy:
+    message: discord.Message
+    keys: list[tuple[int, str]]
+    # on the event loop's clock, for expiring
+    received_at: float
+    # on the perf_counter clock, for timing the command it invokes
+    message_received: float
+    done: bool = False
+
+class ProxyMatcher:
+    """Messages from proxied users, waiting for a proxy bot to echo them.
+
+    An echo can only invoke a command if it starts with a prefix, and it is
+    always a substring of the original. So pending originals are indexed by
+    channel and by every `<prefix><word>` they contain, and an incoming bot
+    message is matched with a single dict lookup on its own leading one.
+    Originals containing no prefix at all can't be echoed into a command, so
+    they aren't held back. Since every entry waits for the same `timeout`,
+    they expire in arrival order, from a single timer.
+    """
+    def __init__(self, on_expire: Callable[[PendingProxy], object], *, timeout: float = 2.0) -> None:
+        self.on_expire = on_expire
+        self.timeout = timeout
+        self.pending: dict[tuple[int, str], list[PendingProxy]] = {}
+        self.queue: deque[PendingProxy] = deque()
+        self.timer: asyncio.TimerHandle | None = None
+        # counters
+        self.immediate = 0
+        self.matched = 0
+        self.expired = 0
+        # how long originals were held back, matched or not
+        self.latency = Histogram()
+
+    @staticmethod
+    def fingerprints(content: str, prefixes: Iterable[str]) -> set[str]:
+        result = set()
+        for prefix in prefixes:
+            start = content.find(prefix)
+            while start != -1:
+                end = start + len(prefix)
+                result.add(prefix + word.match(content, end).group())  # pyright: ignore[reportOptionalMemberAccess]
+                start = content.find(prefix, start + 1)
+        return result
+
+    def expect(self, message: discord.Message, prefixes: Iterable[str], message_received: float) -> bool:
+        """Holds back the message, which came in at `message_received`, until it is echoed or expires.
+        Returns False if no echo of it could be a command, in which case it isn't held."""
+        keys = [
+            (message.channel.id, fingerprint)
+            for fingerprint in self.fingerprints(message.content, prefixes)
+        ]
+        if not keys:
+            self.immediate += 1
+            return False
+        loop = asyncio.get_running_loop()
+        entry = PendingProxy(message, keys, loop.time(), message_received)
+        for key in keys:
+            self.pending.setdefault(key, []).append(entry)
+        self.queue.append(entry)
+        if self.timer is None:
+            self.timer = loop.call_at(entry.received_at + self.timeout, self.expire)
+        return True
+
+    def match(self, message: discord.Message, prefixes: Iterable[str]) -> PendingProxy | None:
+        """Returns the pending original that `message` echoes, if any"""
+        content = message.content
+        prefix = next((prefix for prefix in prefixes if content.startswith(prefix)), None)
+        if prefix is None:
+            return None
+        fingerprint = prefix + word.match(content, len(prefix)).group()  # pyright: ignore[reportOptionalMemberAccess]
+        for entry in self.pending.get((message.channel.id, fingerprint), ()):
+            if content in entry.message.content:
+                self.remove(entry)
+                self.matched += 1
+                self.latency.observe(asyncio.get_running_loop().time() - entry.received_at)
+                return entry
+        return None
+
+    def remove(self, entry: PendingProxy) -> None:
+        entry.done = True
+        for key in entry.keys:
+            entries = self.pending[key]
+            entries.remove(entry)
+            if not entries:
+                del self.pending[key]
+
+    def expire(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        while self.queue and (self.queue[0].done or self.queue[0].received_at + self.timeout <= now):
+            entry = self.queue.popleft()
+            if entry.done:
+                continue
+            self.remove(entry)
+            self.expired += 1
+            self.latency.observe(now - entry.received_at)
+            self.on_expire(entry)
+        # matched entries are only dropped from the queue lazily
+        while self.queue and self.queue[0].done:
+            self.queue.popleft()
+        if self.queue:
+            self.timer = loop.call_at(self.queue[0].received_at + self.timeout, self.expire)
+        else:
+            self.timer = None
+
+    @property
+    def match_rate(self) -> float:
+        total = self.matched + self.expired
+        return self.matched / total if total else 0.0
@@ -1,9 +1,10 @@
 import aiosqlite
 import discord
+from discord import app_commands
 from discord.ext import commands
 
 import re
-from typing import Any, Callable
+import time
 
 from bot import OliviaBot, Context
 
@@ -33,15 +34,25 @@ class NotLouna(commands.CheckFailure):
 
 AnyUser = discord.User | discord.Member | discord.ClientUser
 
-class QwdieConverter(commands.Converter[AnyUser]):
-    def try_find_user(self, bot: OliviaBot, key, mapper: Callable[[discord.User], Any]):
-        return discord.utils.find(
-            lambda user: mapper(user) == key,
-            bot.users
-        )
+def resolve_id(bot: OliviaBot, guild: discord.Guild | None, user_id: int) -> AnyUser | None:
+    """Prefers the member, so nicknames show up"""
+    return guild and guild.get_member(user_id) or bot.get_user(user_id)
 
-    async def convert(self, ctx: commands.Context[OliviaBot], argument: str):
+async def qwdie_autocomplete(interaction: discord.Interaction[OliviaBot], current: str) -> list[app_commands.Choice[str]]:
+    """Suggests users for slash command parameters that use QwdieConverter"""
+    guild = interaction.guild
+    choices = []
+    for _, user_id in interaction.client.user_index.search(current, guild and guild.id):
+        user = resolve_id(interaction.client, guild, user_id)
+        if user:
+            # the id converts back to exactly this user
+            choices.append(app_commands.Choice(name=f"@{user.display_name} ({user})"[:100], value=str(user_id)))
+    return choices
+
+class QwdieConverter(commands.Converter[AnyUser]):
+    def find_choices(self, ctx: commands.Context[OliviaBot], argument: str) -> tuple[list[AnyUser], str]:
         choices: list[AnyUser | None] = []
+        index = ctx.bot.user_index
         # id, mention and username are all unique
         if re.match(r"[0-9]{15,20}", argument):
             choices.append(ctx.bot.get_user(int(argument)))
@@ -50,29 +61,12 @@ class QwdieConverter(commands.Converter[AnyUser]):
             choices.append(ctx.bot.get_user(int(mention_match.group(1))))
         discrim_match = re.match(r"(.+)#([0-9]{4})", argument)
         if discrim_match:
-            choices.append(discord.utils.get(
-                ctx.bot.users,
-                name=discrim_match.group(1),
-                discriminator=discrim_match.group(2)
-            ))
+            choices.extend(map(ctx.bot.get_user, index.users_discriminated(*discrim_match.groups())))
         # okay technically the username is nonunique because bots still don't have pomelo
-        choices.extend([
-            user for user in ctx.bot.users
-            if user.name.casefold() == argument.casefold()
-        ])
-        # global name and guild nickname are not unique, so scan all the options
-        # this may change later for performance purposes but I only have 100ish users
-        choices.extend([
-            user for user in ctx.bot.users
-            if user.global_name and user.global_name.casefold() == argument.casefold()
-        ])
+        # global names, nicknames and aliases aren't unique either, so take every match
+        choices.extend(map(ctx.bot.get_user, index.users_named(argument)))
         if ctx.guild:
-            choices.extend([
-                member for member in ctx.guild.members
-                if member.nick and member.nick.casefold() == argument.casefold()
-            ])
-        # aliases -- casefolded comparison
-        choices.extend(ctx.bot.get_user(id) for alias, ids in ctx.bot.person_aliases.items() for id in ids if alias.casefold() == argument.casefold())
+            choices.extend(map(ctx.guild.get_member, index.members_nicknamed(ctx.guild.id, argument)))
         # special results
         if argument == "🪟" or argument.casefold().rstrip("e").startswith("m"):
             choices.append(ctx.author)
@@ -83,25 +77,42 @@ class QwdieConverter(commands.Converter[AnyUser]):
                 choices.extend(ctx.guild.members)
             else:
                 choices.extend([ctx.author, ctx.me])
+        return list(set(filter(None, choices))), everyone
+
+    def find_similar(self, ctx: commands.Context[OliviaBot], argument: str) -> list[AnyUser]:
+        """The closest partial matches, best first"""
+        ranked = ctx.bot.user_index.search(argument, ctx.guild and ctx.guild.id)
+        return list(filter(None, (resolve_id(ctx.bot, ctx.guild, user_id) for _, user_id in ranked)))
+
+    async def convert(self, ctx: commands.Context[OliviaBot], argument: str):
+        valid_choices, everyone = self.find_choices(ctx, argument)
+        similar = not valid_choices
+        if similar:
+            valid_choices = self.find_similar(ctx, argument)
         # finally resolve the user
-        valid_choices = list(set(filter(None, choices)))
-        if len(valid_choices) == 1:
+        if len(valid_choices) == 1 and not similar:
             return valid_choices[0]
-        elif len(valid_choices) >= 2:
+        elif valid_choices:
             # disambiguate between choices
-            valid_choices = sorted(valid_choices, key=lambda user: str(user).casefold())
-            content = f"which {argument}?{everyone}"
+            if similar:
+                # a guess, even if there's only one, so ask first
+                content = f"no {argument} here, did you mean one of these?"
+            else:
+                valid_choices = sorted(valid_choices, key=lambda user: str(user).casefold())
+                content = f"which {argument}?{everyone}"
             view = QwdieDisambiguator(
                 target=ctx.author,
                 choices=valid_choices,
                 whole_guild=set(valid_choices) == set(ctx.guild and ctx.guild.members or [ctx.author, ctx.me])
             )
+            # waiting for the user to disambiguate doesn't count as converter time
+            start = time.perf_counter()
             msg = await ctx.send(content, view=view)
             await view.wait()
+            if isinstance(ctx, Context):
+                ctx.waiting_time += time.perf_counter() - start
             if view.selected is None:
-                for child in view.children:
-                    assert isinstance(child, (QwdieButton, QwdieSelect, QwdieUserSelect))
-                    child.disabled = True
+                view.disable()
                 await msg.edit(view=view)
                 raise TimeoutError
             else:
@@ -119,9 +130,7 @@ class QwdieButton(discord.ui.Button['QwdieDisambiguator']):
         assert self.view
         view: QwdieDisambiguator = self.view
         view.selected = self.user
-        for child in view.children:
-            assert isinstance(child, QwdieButton)
-            child.disabled = True
+        view.disable()
         self.style = discord.ButtonStyle.green
         await interaction.response.edit_message(view=view)
         view.stop()
@@ -174,9 +183,7 @@ class QwdieSelect(discord.ui.Select['QwdieDisambiguator']):
         assert self.view
         view: QwdieDisambiguator = self.view
         view.selected = self.users[int(self.values[0])]
-        for child in view.children:
-            assert isinstance(child, QwdieSelect)
-            child.disabled = True
+        view.disable()
         self.placeholder = f"@{view.selected}"
         await interaction.response.edit_message(view=view)
         view.stop()
@@ -194,10 +201,24 @@ class QwdieUserSelect(discord.ui.UserSelect['QwdieDisambiguator']):
         await interaction.response.edit_message(view=view)
         view.stop()
 
+class QwdiePageButton(discord.ui.Button['QwdieDisambiguator']):
+    def __init__(self, label: str, page: int, disabled: bool):
+        super().__init__(style=discord.ButtonStyle.gray, label=label, disabled=disabled)
+        self.page = page
+
+    async def callback(self, interaction: discord.Interaction):
+        assert self.view
+        self.view.show_page(self.page)
+        await interaction.response.edit_message(view=self.view)
+
 class QwdieDisambiguator(discord.ui.View):
+    # a view has five rows, and each select takes up a whole one
+    selects_per_page = 4
+
     def __init__(self, *, target: AnyUser, choices: list[AnyUser], whole_guild: bool):
         super().__init__()
         self.target = target
+        self.choices = choices
         self.selected: AnyUser | None = None
         self.msg: discord.Message
         if whole_guild:
@@ -206,15 +227,34 @@ class QwdieDisambiguator(discord.ui.View):
             for choice in choices:
                 self.add_item(QwdieButton(choice))
         elif len(choices) <= 125:
-            max = len(choices)
-            for i in range(0, max, 25):
-                self.add_item(QwdieSelect(
-                    choices[i - 1] if i != 0 else None,
-                    choices[i : i + 25],
-                    choices[i + 25] if i + 25 < max else None
-                ))
+            self.add_selects(0, len(choices))
         else:
-            raise RuntimeError("i don't know what to do here")
+            self.show_page(0)
+
+    def add_selects(self, start: int, stop: int):
+        choices = self.choices
+        for i in range(start, stop, 25):
+            self.add_item(QwdieSelect(
+                choices[i - 1] if i != 0 else None,
+                choices[i : min(i + 25, stop)],
+                choices[i + 25] if i + 25 < len(choices) else None
+            ))
+
+    def show_page(self, page: int):
+        """Too many choices for one message, so the selects are built a page at a time"""
+        per_page = 25 * self.selects_per_page
+        pages = -(-len(self.choices) // per_page)
+        self.clear_items()
+        start = page * per_page
+        self.add_selects(start, min(start + per_page, len(self.choices)))
+        self.add_item(QwdiePageButton("Previous", page - 1, disabled=page == 0))
+        self.add_item(QwdiePageButton(f"{page + 1} / {pages}", page, disabled=True))
+        self.add_item(QwdiePageButton("Next", page + 1, disabled=page == pages - 1))
+
+    def disable(self):
+        for child in self.children:
+            assert isinstance(child, (QwdieButton, QwdiePageButton, QwdieSelect, QwdieUserSelect))
+            child.disabled = True
 
     async def interaction_check(self, interaction: discord.Interaction):
         if interaction.user != self.target:
@@ -6,6 +6,7 @@ import discord
 
 import config
 from bot import OliviaBot
+from database import ReadPool, connect_writer
 
 async def main(prod: bool):
     print("Running the bot in", "production" if prod else "development", "mode:")
@@ -17,11 +18,17 @@ async def main(prod: bool):
         discord.utils.setup_logging(level=logging.INFO)
 
     async with (
-        aiosqlite.connect(config.database_path, isolation_level=None) as main_db,
+        connect_writer(config.database_path) as main_db,
+        ReadPool(config.database_path) as readers,
+        # a second writer, so the write buffer's transactions never take in anyone else's writes;
+        # the two wait on each other for the write lock, see connect_writer
+        connect_writer(config.database_path) as buffer_db,
         aiosqlite.connect(config.chitter_database_path, isolation_level=None) as chitter_db,
         OliviaBot(
             prod=prod,
             db=main_db,
+            readers=readers,
+            buffer_db=buffer_db,
             chitter_db=chitter_db,
             testing_guild_id=config.testing_guild_id,
             testing_channel_id=config.testing_channel_id,
@@ -41,6 +48,8 @@ async def main(prod: bool):
             pass
         finally:
             logging.info("Shutting down...")
+            oliviabot.writes.stop()
+            await oliviabot.writes.flush()
 
 def dev():
     asyncio.run(main(False))
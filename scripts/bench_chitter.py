@@ -0,0 +1,203 @@
+import argparse
+import datetime
+import json
+from pathlib import Path
+import random
+import string
+import sys
+import timeit
+import types
+
+# cogs/chitter.py lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# bot.py imports the deployment's config.py, which isn't checked in; nothing
+# exercised here reads it, so an empty module stands in for it if it's missing
+try:
+    import config
+except ImportError:
+    sys.modules["config"] = types.ModuleType("config")
+
+import discord
+
+from cogs.chitter import AnyValue, BotChitter, get_partial_message, index_key, null
+
+baseline_path = Path(__file__).with_name("bench_chitter_baseline.json")
+widths = [1, 4, 16, 64]
+
+kinds = ["string", "number", "channel", "user", "role", "message", "emoji", "timestamp", "boolean", "null"]
+# everything serialize_string escapes, and some things it doesn't
+string_alphabet = string.ascii_letters + string.digits + ' "\\\n\r\t\0*`|~-@#[]()/<>:!?.,\'' + "é✅🦖\x01\x7f"
+
+def snowflake() -> int:
+    return random.randrange(1 << 40, 1 << 63)
+
+def random_string() -> str:
+    return "".join(random.choices(string_alphabet, k=random.randrange(16)))
+
+def random_number() -> float:
+    match random.randrange(4):
+        case 0: return random.randrange(-10**6, 10**6)
+        case 1: return random.uniform(-1, 1)
+        case 2: return random.choice([0.0, -0.0, 1e-300, 1e300, 2.0**53 + 1])
+        case _: return random.uniform(-1, 1) * 10.0 ** random.randrange(-300, 300)
+
+def random_value(bot, kind: str) -> AnyValue:
+    match kind:
+        case "string": return random_string()
+        case "number": return random_number()
+        case "channel": return discord.Object(snowflake(), type=discord.abc.GuildChannel)
+        case "user": return discord.Object(snowflake(), type=discord.User)
+        case "role": return discord.Object(snowflake(), type=discord.Role)
+        case "message": return get_partial_message(bot, snowflake(), snowflake(), snowflake())
+        case "emoji":
+            # PartialEmoji.from_str only takes ids of 13 digits or more
+            name = "".join(random.choices(string.ascii_letters + string.digits + "_", k=random.randrange(2, 33)))
+            return discord.PartialEmoji(name=name, id=random.randrange(10**12, 1 << 63), animated=random.random() < 0.5)
+        case "timestamp": return datetime.datetime.fromtimestamp(random.randrange(1 << 33), tz=datetime.UTC)
+        case "boolean": return random.random() < 0.5
+        case "null": return null
+        case _: raise RuntimeError("unreachable")
+
+def random_row(bot, width: int) -> list[AnyValue]:
+    return [random_value(bot, random.choice(kinds)) for _ in range(width)]
+
+def canonical(value: AnyValue) -> object:
+    # index keys leave out where a message is, and whether an emoji is animated
+    match value:
+        case discord.PartialMessage():
+            return ("message", value.channel.guild_id, value.channel.id, value.id) # type: ignore
+        case discord.PartialEmoji():
+            return ("emoji", value.name, value.id, value.animated)
+        case float() | int() if not isinstance(value, bool):
+            # -0.0 and 0.0 are equal, but shouldn't be mixed up either
+            return ("number", repr(float(value)))
+        case _:
+            return index_key(value)
+
+# (row, what it should parse to) for the corners of the escape handling
+known_rows: list[tuple[str, list[AnyValue] | None]] = [
+    (r'"\x41\x7f\x00"', ["A\x7f\x00"]),
+    # \x only goes up to \x7f
+    (r'"\x80"', None),
+    (r'"\xg0"', None),
+    (r'"\q"', None),
+    (r'"\n\r\t\0"', ["\n\r\t\0"]),
+    (r'"\*\`\|\~\-\@\#\[\]\(\)\/\.\ "', ["*`|~-@#[]()/. "]),
+    ('``"`"``', ["`"]),
+    ('``"\\`"``', ["`"]),
+    ('"a" ', None),
+    ('', None),
+    ('   ', None),
+]
+
+def best_times(*functions, repeat: int = 7) -> list[float]:
+    """The best time of each function, running them in turns.
+
+    The best of a few runs is the least disturbed by whatever else is running,
+    and taking turns disturbs them all alike when the machine slows down.
+    """
+    times = [float("inf")] * len(functions)
+    for _ in range(repeat):
+        for i, function in enumerate(functions):
+            times[i] = min(times[i], timeit.timeit(function, number=1))
+    return times
+
+# A fixed bit of string-heavy Python to time alongside each width. Rates are
+# stored relative to it, so a baseline taken on a laptop still means something
+# on a slower CI machine.
+calibration_text = "".join(random.Random(0).choices(string_alphabet, k=50_000))
+
+def calibration() -> list[str]:
+    out = []
+    for char in calibration_text:
+        out.append("\\" + char if char in '"\\*`' else char)
+    return "".join(out).split()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Round-trip fuzz and benchmark the bot-chitter serializer and parser, offline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cases", type=int, default=20_000, help="how many random rows to round-trip")
+    parser.add_argument("--rows", type=int, default=2_000, help="how many rows to time at each width")
+    parser.add_argument("--no-bench", action="store_true", help="only check round trips")
+    parser.add_argument("--tolerance", type=float, default=0.35, help="how much slower than the baseline a rate may be, as a fraction")
+    parser.add_argument("--update-baseline", action="store_true", help=f"write the measured rates to {baseline_path.name}")
+    args = parser.parse_args()
+
+    # nothing here talks to discord, but partial messages need a client to hang off
+    chitter = BotChitter(discord.Client(intents=discord.Intents.none())) # type: ignore
+    bot = chitter.bot
+    failures = 0
+
+    def fail(message: str) -> None:
+        nonlocal failures
+        failures += 1
+        if failures <= 10:
+            print(message)
+
+    for row, expected in known_rows:
+        parsed = chitter.parse_generic_row(row)
+        if (parsed and list(map(canonical, parsed))) != (expected and list(map(canonical, expected))):
+            fail(f"{row!r} parsed to {parsed!r}, not {expected!r}")
+
+    random.seed(args.seed)
+    for _ in range(args.cases):
+        row = random_row(bot, random.randrange(1, 9))
+        serialized = chitter.serialize_generic_row(*row)
+        parsed = chitter.parse_generic_row(serialized)
+        if parsed is None or list(map(canonical, parsed)) != list(map(canonical, row)):
+            fail(f"{row!r} serialized to {serialized!r}, which parsed to {parsed!r}")
+
+    # backticks around a string don't change what it parses to
+    for _ in range(args.cases // 10):
+        value = random_string()
+        serialized = chitter.serialize_string(value, backticks=random.randrange(4))
+        if chitter.parse_generic_row(serialized) != [value]:
+            fail(f"{value!r} serialized to {serialized!r}, which parsed to {chitter.parse_generic_row(serialized)!r}")
+
+    print(f"round trips: {args.cases + args.cases // 10 + len(known_rows)} checked, {failures} failed")
+
+    if args.no_bench:
+        return failures
+
+    # the same rows each time, however many round trips came before
+    random.seed(args.seed)
+    # rows per second for each width, per million calibration characters per second
+    rates: dict[str, dict[str, float]] = {}
+    print(f"{'width':>5} {'parse rows/s':>14} {'serialize rows/s':>17}")
+    for width in widths:
+        rows = [random_row(bot, width) for _ in range(args.rows)]
+        serialized_rows = [chitter.serialize_generic_row(*row) for row in rows]
+        calibration_time, parse_time, serialize_time = best_times(
+            calibration,
+            lambda: [chitter.parse_generic_row(row) for row in serialized_rows],
+            lambda: [chitter.serialize_generic_row(*row) for row in rows],
+        )
+        parse_rate = args.rows / parse_time
+        serialize_rate = args.rows / serialize_time
+        print(f"{width:>5} {parse_rate:>14,.0f} {serialize_rate:>17,.0f}")
+        calibration_rate = len(calibration_text) / calibration_time
+        rates[str(width)] = {
+            "parse": round(parse_rate / calibration_rate * 1e6, 1),
+            "serialize": round(serialize_rate / calibration_rate * 1e6, 1),
+        }
+
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(rates, indent=4) + "\n")
+        print(f"wrote {baseline_path.name}")
+        return failures
+    if not baseline_path.exists():
+        print(f"no {baseline_path.name} to compare against, run with --update-baseline to write one")
+        return failures
+
+    baseline = json.loads(baseline_path.read_text())
+    for width, measured in rates.items():
+        for operation, rate in measured.items():
+            expected = baseline.get(width, {}).get(operation)
+            if expected is None:
+                continue
+            if rate < expected * (1 - args.tolerance):
+                fail(f"{operation} of {width} wide rows runs at {rate / expected:.0%} of the baseline")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(main() > 0)
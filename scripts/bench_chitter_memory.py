@@ -0,0 +1,71 @@
+import argparse
+import gc
+from pathlib import Path
+import random
+import sys
+import tracemalloc
+import types
+
+# cogs/chitter.py lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# bot.py imports the deployment's config.py, which isn't checked in; nothing
+# measured here reads it, so an empty module stands in for it if it's missing
+try:
+    import config
+except ImportError:
+    sys.modules["config"] = types.ModuleType("config")
+
+import discord
+
+from cogs.chitter import ChitterBase, parse_chitter_row
+
+timezones = ["Europe/Helsinki", "America/Toronto", "Asia/Tokyo", "Australia/Sydney", "Europe/London", "UTC"]
+aliases = ["olivia", "liv", "rocket", "the bot", "qwdie", "helper", "owner", "chatter"]
+
+def snowflake() -> int:
+    return random.randrange(1 << 55, 1 << 62)
+
+def synthetic_row() -> str:
+    """A row shaped like the ones in the tables bots actually keep"""
+    match random.random():
+        case x if x < 0.4:
+            return f'<@{snowflake()}> "{random.choice(timezones)}"'
+        case x if x < 0.8:
+            return f'<@{snowflake()}> "{random.choice(aliases)}"'
+        case _:
+            return (
+                f"https://discord.com/channels/{snowflake()}/{snowflake()}/{snowflake()} "
+                f"<t:{random.randrange(1 << 31)}:R> {random.randrange(1000)} {random.choice('✅❌')} <#{snowflake()}>"
+            )
+
+def measure(build) -> tuple[int, dict[int, object]]:
+    gc.collect()
+    tracemalloc.start()
+    store = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, store
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the memory used by parsed and compact bot-chitter rows")
+    parser.add_argument("--rows", type=int, default=100_000, help="how many rows to store")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    contents = [synthetic_row() for _ in range(args.rows)]
+    base = ChitterBase(discord.Client(intents=discord.Intents.none())) # type: ignore
+
+    parsed_size, parsed = measure(lambda: {i: base.parse_generic_row(content) for i, content in enumerate(contents)})
+    compact_size, compact = measure(lambda: {i: parse_chitter_row(content) for i, content in enumerate(contents)})
+
+    for i in random.sample(range(args.rows), min(args.rows, 1000)):
+        assert [repr(value) for value in compact[i].values(base.bot)] == [repr(value) for value in parsed[i]] # type: ignore
+
+    print(f"{args.rows} rows")
+    print(f"parsed:  {parsed_size / 2**20:8.1f} MiB ({parsed_size / args.rows:.0f} bytes per row)")
+    print(f"compact: {compact_size / 2**20:8.1f} MiB ({compact_size / args.rows:.0f} bytes per row)")
+    print(f"{parsed_size / compact_size:.1f}x smaller")
+
+if __name__ == "__main__":
+    main()
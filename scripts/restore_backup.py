@@ -0,0 +1,31 @@
+import argparse
+import datetime
+from pathlib import Path
+import sqlite3
+import sys
+
+# backups.py lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import backups
+
+parser = argparse.ArgumentParser(description="Rebuild the database from a chain of backup snapshots")
+parser.add_argument("output", type=Path, nargs="?", help="where to write the restored database")
+parser.add_argument("--dir", type=Path, default=Path("backups"), help="the backup directory")
+parser.add_argument("--until", type=datetime.datetime.fromisoformat, help="restore the latest snapshot from at or before this time")
+parser.add_argument("--list", action="store_true", help="list the available snapshots and exit")
+args = parser.parse_args()
+
+if args.list:
+    for path in backups.snapshots(args.dir):
+        kind = "full " if backups.is_full(path) else "delta"
+        print(f"{kind} {backups.snapshot_time(path)} ({path.stat().st_size} bytes)")
+    sys.exit()
+
+if args.output is None:
+    parser.error("an output path is required")
+if args.output.exists():
+    parser.error(f"{args.output} already exists")
+
+args.output.write_bytes(backups.restore(args.dir, args.until))
+[[result]] = sqlite3.connect(args.output).execute("PRAGMA integrity_check;").fetchall()
+print(f"Restored {args.output} (integrity check: {result})")
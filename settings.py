@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from bot import OliviaBot
+
+class Liker(NamedTuple):
+    enabled_after: float
+    enabled_in_cw: bool
+
+class UserSettings:
+    """In-memory snapshot of the `proxiers`, `likers` and `auto_olivias` tables.
+
+    Lookups are plain set / dict hits. Every write goes to the database first
+    and only then to the snapshot, so a failed query leaves both untouched.
+    """
+    def __init__(self, bot: OliviaBot) -> None:
+        self.bot = bot
+        self.proxiers: set[int] = set()
+        self.likers: dict[int, Liker] = {}
+        self.auto_olivias: set[int] = set()
+
+    async def load(self) -> None:
+        async with self.bot.cursor(readonly=True) as cur:
+            await cur.execute("""SELECT user_id FROM proxiers;""")
+            self.proxiers = {user_id for [user_id] in await cur.fetchall()}
+            await cur.execute("""SELECT user_id, enabled_after, enabled_in_cw FROM likers;""")
+            self.likers = {
+                user_id: Liker(enabled_after, bool(enabled_in_cw))
+                for user_id, enabled_after, enabled_in_cw in await cur.fetchall()
+            }
+            await cur.execute("""SELECT user_id FROM auto_olivias;""")
+            self.auto_olivias = {user_id for [user_id] in await cur.fetchall()}
+
+    def is_proxied(self, user_id: int) -> bool:
+        return user_id in self.proxiers
+
+    async def set_proxied(self, user_id: int, proxied: bool) -> None:
+        async with self.bot.cursor() as cur:
+            if proxied:
+                await cur.execute(
+                    """INSERT OR IGNORE INTO proxiers VALUES(?);""", [user_id]
+                )
+                self.proxiers.add(user_id)
+            else:
+                await cur.execute(
+                    """DELETE FROM proxiers WHERE user_id = ?;""", [user_id]
+                )
+                self.proxiers.discard(user_id)
+
+    async def set_like_enabled_after(self, user_id: int, timestamp: float) -> None:
+        async with self.bot.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO likers(user_id, enabled_after) VALUES(?, ?)
+                ON CONFLICT(user_id) DO
+                UPDATE SET enabled_after=excluded.enabled_after;
+                """,
+                [user_id, timestamp],
+            )
+        previous = self.likers.get(user_id)
+        self.likers[user_id] = Liker(timestamp, previous is not None and previous.enabled_in_cw)
+
+    async def set_like_enabled_in_cw(self, user_id: int, enabled: bool) -> None:
+        async with self.bot.cursor() as cur:
+            await cur.execute(
+                """UPDATE likers SET enabled_in_cw = ? WHERE user_id = ?;""",
+                [int(enabled), user_id]
+            )
+        if user_id in self.likers:
+            self.likers[user_id] = self.likers[user_id]._replace(enabled_in_cw=enabled)
+
+    async def remove_liker(self, user_id: int) -> None:
+        async with self.bot.cursor() as cur:
+            await cur.execute(
+                """DELETE FROM likers WHERE user_id = ?;""", [user_id]
+            )
+        self.likers.pop(user_id, None)
+
+    async def set_auto_olivia(self, user_id: int, olivia: bool) -> None:
+        async with self.bot.cursor() as cur:
+            if olivia:
+                await cur.execute(
+                    """INSERT OR IGNORE INTO auto_olivias VALUES(?);""", [user_id]
+                )
+                self.auto_olivias.add(user_id)
+            else:
+                await cur.execute(
+                    """DELETE FROM auto_olivias WHERE user_id = ?;""", [user_id]
+                )
+                self.auto_olivias.discard(user_id)
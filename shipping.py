@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import datetime
+import enum
+import hashlib
+import io
+import logging
+import traceback
+from typing import TYPE_CHECKING
+
+import discord
+from discord.ext import tasks
+
+if TYPE_CHECKING:
+    from bot import OliviaBot
+
+class Priority(enum.IntEnum):
+    LOW = 0
+    INFO = 1
+    HIGH = 2
+
+@dataclass
+class ErrorGroup:
+    title: str
+    traceback: str | None
+    context: str
+    first_seen: datetime.datetime
+    count: int = 1
+
+@dataclass
+class Digest:
+    lines: list[tuple[Priority, str]] = field(default_factory=list)
+    errors: dict[str, ErrorGroup] = field(default_factory=dict)
+
+def error_fingerprint(error: BaseException) -> str:
+    """Identical tracebacks share a fingerprint, even if their messages differ"""
+    frames = traceback.extract_tb(error.__traceback__)
+    key = [type(error).__qualname__, *(f"{frame.filename}:{frame.lineno}:{frame.name}" for frame in frames)]
+    if not frames:
+        # nothing else to tell them apart by
+        key.append(str(error))
+    return hashlib.sha1("\n".join(key).encode()).hexdigest()
+
+class LogShipper:
+    """Ships log lines and errors to the webhook in periodic digests.
+
+    Errors with the same fingerprint are grouped with an occurrence count, so
+    an error storm costs one embed per distinct traceback. Lines queue up to
+    `max_lines`; past that, the oldest line of the lowest priority is dropped
+    first. Everything goes out through the bot's one webhook, one digest every
+    `interval` seconds.
+    """
+    # Discord allows 10 embeds per message, of 6000 characters in total; as
+    # many errors go out as fit, which with these limits is at least two
+    max_embeds = 10
+    embed_limit = 6000
+    traceback_limit = 1200
+    context_limit = 600
+    # and the content under 2000, with room for the dropped lines notice
+    content_limit = 1900
+    line_limit = 1800
+
+    def __init__(self, bot: OliviaBot, *, interval: float = 5.0, max_lines: int = 100, max_errors: int = 25) -> None:
+        self.bot = bot
+        self.max_lines = max_lines
+        self.max_errors = max_errors
+        self.pending = Digest()
+        self.lock = asyncio.Lock()
+        # statistics
+        self.dropped = 0
+        self.grouped = 0
+        self.digests = 0
+        self.flusher.change_interval(seconds=interval)
+
+    def start(self) -> None:
+        self.flusher.start()
+
+    def stop(self) -> None:
+        self.flusher.cancel()
+
+    @tasks.loop(seconds=5.0)
+    async def flusher(self):
+        await self.flush()
+
+    def log(self, line: str, priority: Priority = Priority.INFO) -> None:
+        lines = self.pending.lines
+        if len(lines) >= self.max_lines:
+            lowest = min(range(len(lines)), key=lambda i: lines[i][0])
+            if lines[lowest][0] > priority:
+                self.dropped += 1
+                return
+            del lines[lowest]
+            self.dropped += 1
+        lines.append((priority, line))
+
+    def error(self, error: BaseException, title: str, context: str, *, include_traceback: bool = True) -> None:
+        fingerprint = error_fingerprint(error)
+        group = self.pending.errors.get(fingerprint)
+        if group is not None:
+            group.count += 1
+            self.grouped += 1
+            return
+        if len(self.pending.errors) >= self.max_errors:
+            self.dropped += 1
+            return
+        tb = "".join(traceback.format_exception(error)) if include_traceback else None
+        self.pending.errors[fingerprint] = ErrorGroup(title, tb, context, discord.utils.utcnow())
+
+    async def upload(self, filename: str, data: bytes) -> None:
+        """Sends a file right away, between digests"""
+        async with self.lock:
+            await self.bot.webhook.send(file=discord.File(io.BytesIO(data), filename=filename))
+
+    def render_error(self, group: ErrorGroup) -> discord.Embed:
+        title = group.title if group.count == 1 else f"{group.title} (\N{MULTIPLICATION SIGN}{group.count})"
+        description = None
+        if group.traceback:
+            # the end of a traceback is the interesting part
+            description = f"```py\n{group.traceback[-self.traceback_limit:]}\n```"
+        embed = discord.Embed(
+            title=title[:256],
+            description=description,
+            color=discord.Color.from_str("#db7420"),
+            timestamp=group.first_seen,
+        )
+        embed.add_field(name="First seen in", value=group.context[:self.context_limit], inline=False)
+        return embed
+
+    async def flush(self) -> None:
+        async with self.lock:
+            digest = self.pending
+            if not digest.lines and not digest.errors:
+                return
+            # whatever doesn't fit stays for the next digest
+            content_lines: list[str] = []
+            length = 0
+            taken = 0
+            for _, line in digest.lines:
+                line = line[:self.line_limit]
+                if length + len(line) + 1 > self.content_limit:
+                    break
+                content_lines.append(line)
+                length += len(line) + 1
+                taken += 1
+            embeds: list[discord.Embed] = []
+            groups: dict[str, ErrorGroup] = {}
+            for fingerprint, group in digest.errors.items():
+                embed = self.render_error(group)
+                if len(embeds) == self.max_embeds or sum(map(len, embeds)) + len(embed) > self.embed_limit:
+                    break
+                embeds.append(embed)
+                groups[fingerprint] = group
+            for fingerprint in groups:
+                del digest.errors[fingerprint]
+            lines = digest.lines[:taken]
+            del digest.lines[:taken]
+            dropped = self.dropped
+            if dropped:
+                content_lines.append(f"-# dropped {dropped} lines and errors to keep up")
+                self.dropped = 0
+
+            try:
+                await self.bot.webhook.send("\n".join(content_lines) or None, embeds=embeds)
+                self.digests += 1
+            except discord.HTTPException as e:
+                # not shipped to the webhook, for obvious reasons
+                if e.status < 500 and e.status != 429:
+                    # it would only be rejected again
+                    logging.exception("Discord rejected a log digest, dropping it")
+                    return
+                logging.exception("Failed to send a log digest, keeping it for the next one")
+                self.restore(lines, groups, dropped)
+            except Exception:
+                logging.exception("Failed to send a log digest, keeping it for the next one")
+                self.restore(lines, groups, dropped)
+
+    def restore(self, lines: list[tuple[Priority, str]], groups: dict[str, ErrorGroup], dropped: int) -> None:
+        """Puts back what a failed digest took, ahead of anything that came in since"""
+        self.pending.lines[:0] = lines
+        while len(self.pending.lines) > self.max_lines:
+            pending = self.pending.lines
+            del pending[min(range(len(pending)), key=lambda i: pending[i][0])]
+            self.dropped += 1
+        for fingerprint, group in groups.items():
+            newer = self.pending.errors.get(fingerprint)
+            if newer is not None:
+                group.count += newer.count
+            self.pending.errors[fingerprint] = group
+        self.dropped += dropped
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import bisect
+from collections import Counter
+from typing import Iterable
+
+import discord
+
+def trigrams(term: str) -> set[str]:
+    # padded, so short terms and word starts still get trigrams of their own
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+class UserIndex:
+    """Maps the names people go by to their user ids.
+
+    Usernames, global names, nicknames and aliases are indexed casefolded, and
+    kept up to date from gateway events and alias changes, so a converter can
+    resolve a name with a few dict lookups instead of scanning every user.
+    The index only holds ids; resolve them through the bot or guild caches.
+    """
+    def __init__(self) -> None:
+        self.names: dict[str, set[int]] = {}
+        self.global_names: dict[str, set[int]] = {}
+        # exact username and discriminator, like the user cache compares them
+        self.discriminators: dict[str, set[int]] = {}
+        # guild id -> nickname -> member ids
+        self.nicks: dict[int, dict[str, set[int]]] = {}
+        # the same alias can be given to someone twice in different cases
+        self.aliases: dict[str, Counter[int]] = {}
+        # what everyone is indexed under now, to unindex it when it changes
+        self.indexed_users: dict[int, tuple[str, str | None, str]] = {}
+        self.indexed_nicks: dict[tuple[int, int], str] = {}
+        # every key in the maps above, for searching by prefix or similarity
+        self.terms: Counter[str] = Counter()
+        self.sorted_terms: list[str] = []
+        self.trigrams: dict[str, set[str]] = {}
+        self.trigram_counts: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.indexed_users)
+
+    def add_term(self, term: str) -> None:
+        self.terms[term] += 1
+        if self.terms[term] > 1:
+            return
+        bisect.insort(self.sorted_terms, term)
+        grams = trigrams(term)
+        self.trigram_counts[term] = len(grams)
+        for trigram in grams:
+            self.trigrams.setdefault(trigram, set()).add(term)
+
+    def remove_term(self, term: str) -> None:
+        self.terms[term] -= 1
+        if self.terms[term] > 0:
+            return
+        del self.terms[term]
+        del self.trigram_counts[term]
+        del self.sorted_terms[bisect.bisect_left(self.sorted_terms, term)]
+        for trigram in trigrams(term):
+            terms = self.trigrams[trigram]
+            terms.discard(term)
+            if not terms:
+                del self.trigrams[trigram]
+
+    def index_add(self, mapping: dict[str, set[int]], key: str, user_id: int) -> None:
+        if key not in mapping:
+            mapping[key] = set()
+            if mapping is not self.discriminators:
+                self.add_term(key)
+        mapping[key].add(user_id)
+
+    def index_discard(self, mapping: dict[str, set[int]], key: str, user_id: int) -> None:
+        ids = mapping.get(key)
+        if ids is not None:
+            ids.discard(user_id)
+            if not ids:
+                del mapping[key]
+                if mapping is not self.discriminators:
+                    self.remove_term(key)
+
+    def add_user(self, user: discord.abc.User) -> None:
+        """Indexes a user, or reindexes them if their names have changed"""
+        keys = (user.name.casefold(), user.global_name and user.global_name.casefold(), f"{user.name}#{user.discriminator}")
+        if self.indexed_users.get(user.id) == keys:
+            return
+        self.remove_user(user.id)
+        name, global_name, discriminator = keys
+        self.index_add(self.names, name, user.id)
+        if global_name:
+            self.index_add(self.global_names, global_name, user.id)
+        self.index_add(self.discriminators, discriminator, user.id)
+        self.indexed_users[user.id] = keys
+
+    def remove_user(self, user_id: int) -> None:
+        keys = self.indexed_users.pop(user_id, None)
+        if keys is None:
+            return
+        name, global_name, discriminator = keys
+        self.index_discard(self.names, name, user_id)
+        if global_name:
+            self.index_discard(self.global_names, global_name, user_id)
+        self.index_discard(self.discriminators, discriminator, user_id)
+
+    def set_nick(self, guild_id: int, user_id: int, nick: str | None) -> None:
+        nicks = self.nicks.setdefault(guild_id, {})
+        previous = self.indexed_nicks.pop((guild_id, user_id), None)
+        if previous is not None:
+            self.index_discard(nicks, previous, user_id)
+        if nick:
+            folded = nick.casefold()
+            self.index_add(nicks, folded, user_id)
+            self.indexed_nicks[guild_id, user_id] = folded
+
+    def add_member(self, member: discord.Member) -> None:
+        self.add_user(member)
+        self.set_nick(member.guild.id, member.id, member.nick)
+
+    def remove_member(self, member: discord.Member) -> None:
+        self.set_nick(member.guild.id, member.id, None)
+        # nobody else will tell us if they're gone for good
+        if not member.mutual_guilds:
+            self.remove_user(member.id)
+
+    def add_guild(self, guild: discord.Guild) -> None:
+        for member in guild.members:
+            self.add_member(member)
+
+    def remove_guild(self, guild: discord.Guild) -> None:
+        for member in guild.members:
+            self.remove_member(member)
+        # whatever is left was never in the member cache
+        for nick, ids in self.nicks.pop(guild.id, {}).items():
+            self.remove_term(nick)
+            for user_id in ids:
+                self.indexed_nicks.pop((guild.id, user_id), None)
+
+    def rebuild(self, users: Iterable[discord.User], guilds: Iterable[discord.Guild]) -> None:
+        """Reindexes every user and member, keeping the aliases"""
+        self.names.clear()
+        self.global_names.clear()
+        self.discriminators.clear()
+        self.nicks.clear()
+        self.indexed_users.clear()
+        self.indexed_nicks.clear()
+        self.terms.clear()
+        self.sorted_terms.clear()
+        self.trigrams.clear()
+        self.trigram_counts.clear()
+        for alias in self.aliases:
+            self.add_term(alias)
+        for user in users:
+            self.add_user(user)
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def add_alias(self, alias: str, user_id: int) -> None:
+        folded = alias.casefold()
+        if folded not in self.aliases:
+            self.aliases[folded] = Counter()
+            self.add_term(folded)
+        self.aliases[folded][user_id] += 1
+
+    def remove_alias(self, alias: str, user_id: int) -> None:
+        folded = alias.casefold()
+        ids = self.aliases.get(folded)
+        if ids is None:
+            return
+        ids[user_id] -= 1
+        if ids[user_id] <= 0:
+            del ids[user_id]
+        if not ids:
+            del self.aliases[folded]
+            self.remove_term(folded)
+
+    def load_aliases(self, person_aliases: dict[str, list[int]]) -> None:
+        for alias in self.aliases:
+            self.remove_term(alias)
+        self.aliases = {}
+        for alias, ids in person_aliases.items():
+            for user_id in ids:
+                self.add_alias(alias, user_id)
+
+    def users_named(self, name: str) -> set[int]:
+        """Everyone with this username, global name or alias, ignoring case"""
+        folded = name.casefold()
+        return self.names.get(folded, set()).union(
+            self.global_names.get(folded, ()),
+            self.aliases.get(folded, ()),
+        )
+
+    def users_discriminated(self, name: str, discriminator: str) -> set[int]:
+        return set(self.discriminators.get(f"{name}#{discriminator}", ()))
+
+    def members_nicknamed(self, guild_id: int, nick: str) -> set[int]:
+        return set(self.nicks.get(guild_id, {}).get(nick.casefold(), ()))
+
+    def ids_for(self, term: str, guild_id: int | None) -> set[int]:
+        ids = self.users_named(term)
+        if guild_id is not None:
+            ids |= self.members_nicknamed(guild_id, term)
+        return ids
+
+    def search(self, query: str, guild_id: int | None = None, *, limit: int = 25, threshold: float = 0.3) -> list[tuple[float, int]]:
+        """Ranks everyone whose names partially match the query, best first.
+
+        Exact matches score 3, prefix matches between 2 and 3 depending on how
+        much of the name they cover, and anything else by trigram similarity,
+        as long as it reaches the threshold.
+        """
+        folded = query.casefold()
+        if not folded:
+            return []
+        ranked: dict[int, float] = {}
+        def rank(term: str, score: float) -> None:
+            for user_id in self.ids_for(term, guild_id):
+                if score > ranked.get(user_id, 0):
+                    ranked[user_id] = score
+
+        start = end = bisect.bisect_left(self.sorted_terms, folded)
+        while end < len(self.sorted_terms) and self.sorted_terms[end].startswith(folded):
+            end += 1
+        # shorter names are closer matches, so the rest can be skipped once there's enough
+        for term in sorted(self.sorted_terms[start:end], key=len):
+            if len(ranked) >= limit:
+                break
+            rank(term, 2 + len(folded) / len(term))
+        # similar names always rank below prefixes, so they can only fill up the rest
+        if len(ranked) < limit:
+            query_trigrams = trigrams(folded)
+            shared: Counter[str] = Counter()
+            for trigram in query_trigrams:
+                shared.update(self.trigrams.get(trigram, ()))
+            for term, count in shared.items():
+                similarity = count / (len(query_trigrams) + self.trigram_counts[term] - count)
+                if similarity >= threshold:
+                    rank(term, similarity)
+        return sorted(((score, user_id) for user_id, score in ranked.items()), key=lambda pair: (-pair[0], pair[1]))[:limit]